@@ -0,0 +1 @@
+default_app_config = 'haley_gg.apps.stats.apps.StatsConfig'
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class StatsConfig(AppConfig):
     name = 'haley_gg.apps.stats'
     verbose_name = 'stats'
+
+    def ready(self):
+        # Connect signal receivers.
+        from haley_gg.apps.stats import signals  # noqa: F401
+        from haley_gg.apps.stats import checks  # noqa: F401
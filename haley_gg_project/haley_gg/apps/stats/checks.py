@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Warning
+from django.core.checks import register
+
+
+LOCAL_MEMORY_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    # Versions of statistics are changed only in cache of writing process.
+    if settings.CACHES['default']['BACKEND'] != LOCAL_MEMORY_CACHE_BACKEND:
+        return []
+    return [
+        Warning(
+            'Statistics are cached in local memory of each process.',
+            hint=(
+                'Other processes read statistics of previous results '
+                'until they expire. Use shared cache, '
+                'such as DatabaseCache, when running multiple processes.'
+            ),
+            id='stats.W001',
+        )
+    ]
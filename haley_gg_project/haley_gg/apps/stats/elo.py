@@ -0,0 +1,114 @@
+import numpy as np
+
+
+"""
+Elo is calculated on melee games in chronological order.
+
+- 계산식
+m = 연승/연패값 (절댓값), 경기 전의 연승/연패값을 사용한다. 최대 MAX_STREAK.
+k = 32 + 1.641^(m-1) - 1
+w = 승리 여부 ( 승=1, 패=0 )
+변동 Elo = myElo +
+    k * (
+        w - (
+            1 /
+            (
+                1 + 10^((opElo-myElo)/400)
+            )
+        )
+    )
+
+Elo value is saved as integer, so it is rounded after every game.
+Both replay and incremental update use same functions below,
+so they always make same values.
+"""
+
+INITIAL_ELO = 1500
+
+# k grows exponentially with streak, so Elo of long streak overflows.
+# Streak over this value uses k of this value. (k is about 117)
+MAX_STREAK = 10
+
+
+def get_k_factor(streak):
+    m = np.minimum(np.abs(streak), MAX_STREAK)
+    return 32 + 1.641 ** (m - 1) - 1
+
+
+def get_expected_score(my_elo, opponent_elo):
+    return 1 / (1 + 10 ** ((opponent_elo - my_elo) / 400))
+
+
+def get_changed_elo(my_elo, opponent_elo, streak, is_win):
+    return np.rint(
+        my_elo + get_k_factor(streak) * (
+            is_win - get_expected_score(my_elo, opponent_elo)
+        )
+    ).astype(np.int64)
+
+
+def get_changed_streak(streak, is_win):
+    # Positive value is win streak, and negative value is lose streak.
+    if is_win:
+        return np.maximum(streak, 0) + 1
+    return np.minimum(streak, 0) - 1
+
+
+def get_game_levels(winner_index, loser_index, player_count):
+    """
+    Level of game is one more than the last level of both players.
+    Games in same level don't share any player,
+    so they can be calculated at once.
+    """
+    last_level = [0] * player_count
+    levels = np.empty(len(winner_index), dtype=np.int64)
+    for game_index, (winner, loser) in enumerate(
+        zip(winner_index.tolist(), loser_index.tolist())
+    ):
+        level = max(last_level[winner], last_level[loser]) + 1
+        last_level[winner] = last_level[loser] = level
+        levels[game_index] = level
+    return levels
+
+
+def replay(winner_index, loser_index, elo, streak):
+    """
+    Calculate Elo of games sorted by date.
+    winner_index and loser_index are indexes of players in elo and streak,
+    which have values of players before first game.
+    elo and streak are changed to values after last game.
+
+    Return Elo and streak of winner and loser after each game.
+    """
+    game_count = len(winner_index)
+    winner_elo = np.empty(game_count, dtype=np.int64)
+    loser_elo = np.empty(game_count, dtype=np.int64)
+    winner_streak = np.empty(game_count, dtype=np.int64)
+    loser_streak = np.empty(game_count, dtype=np.int64)
+
+    levels = get_game_levels(winner_index, loser_index, len(elo))
+    # Stable sort keeps chronological order in same level.
+    game_order = np.argsort(levels, kind='stable')
+    level_boundaries = np.flatnonzero(np.diff(levels[game_order])) + 1
+
+    for games in np.split(game_order, level_boundaries):
+        if len(games) == 0:
+            continue
+        winners = winner_index[games]
+        losers = loser_index[games]
+
+        winner_elo[games] = get_changed_elo(
+            elo[winners], elo[losers], streak[winners], 1
+        )
+        loser_elo[games] = get_changed_elo(
+            elo[losers], elo[winners], streak[losers], 0
+        )
+        winner_streak[games] = get_changed_streak(streak[winners], True)
+        loser_streak[games] = get_changed_streak(streak[losers], False)
+
+        elo[winners] = winner_elo[games]
+        elo[losers] = loser_elo[games]
+        streak[winners] = winner_streak[games]
+        streak[losers] = loser_streak[games]
+
+    return winner_elo, loser_elo, winner_streak, loser_streak
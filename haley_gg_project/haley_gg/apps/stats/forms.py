@@ -1,13 +1,25 @@
+from collections import Counter
+
 from django import forms
 from django.forms import formset_factory
+from django.urls import reverse_lazy
+from django.db import transaction
 from django.db.models import Q
 
 from haley_gg.apps.stats.models import Player
 from haley_gg.apps.stats.models import Map
 from haley_gg.apps.stats.models import Result
+from haley_gg.apps.stats.models import Match
+from haley_gg.apps.stats.models import Game
 from haley_gg.apps.stats.models import League
 from haley_gg.apps.stats.models import ProleagueTeam
+from haley_gg.apps.stats.models import PlayerStreak
+from haley_gg.apps.stats.models import RaceMatchup
+from haley_gg.apps.stats.models import HeadToHead
+from haley_gg.apps.stats.models import Elo
 from haley_gg.apps.stats.utils import remove_space
+from haley_gg.apps.stats.search import player_name_index
+from haley_gg.apps.stats.search import get_player
 
 
 class SearchPlayerForm(forms.Form):
@@ -16,15 +28,27 @@ class SearchPlayerForm(forms.Form):
         widget=forms.TextInput(
             attrs={
                 'type': 'text',
-                'class': 'form-control'
+                'class': 'form-control',
+                'autocomplete': 'off',
+                'list': 'player-name-list',
+                'data-autocomplete-url': reverse_lazy(
+                    'stats:player_autocomplete'
+                ),
             }
         )
     )
 
     def clean_name(self):
-        name = self.cleaned_data.get('name')
-        name = remove_space(name)
-        return name
+        # Return saved name of player,
+        # or the most matched name when there is no same name.
+        name = remove_space(self.cleaned_data.get('name'))
+        player_name = player_name_index.get_name(name)
+        if player_name is None:
+            name_list = player_name_index.search(name, limit=1)
+            if not name_list:
+                raise forms.ValidationError('선수를 찾을 수 없습니다.')
+            player_name = name_list[0]
+        return player_name
 
 
 class UpdatePlayerForm(forms.ModelForm):
@@ -232,17 +256,15 @@ class PVPDataFormSet(forms.BaseFormSet):
         if self.total_error_count() > 0:
             return
 
+        # Check that data already exists with resultForm data given.
+        # Rounds of all forms are checked in one query.
+        existing_rounds = self.get_existing_rounds()
+
         # Group by round
         grouped_form = {}
         for form in self.forms:
             round = form.cleaned_data.get('round')
-            # Check that data already exists with resultForm data given.
-            if Result.objects.filter(
-                date=self.resultForm.cleaned_data.get('date'),
-                league=self.resultForm.cleaned_data.get('league'),
-                title=self.resultForm.cleaned_data.get('title'),
-                round=round
-            ).exists():
+            if round in existing_rounds:
                 error_msg = '같은 경기 결과가 이미 존재합니다.'
                 form.add_error('round', error_msg)
                 continue
@@ -259,15 +281,18 @@ class PVPDataFormSet(forms.BaseFormSet):
                 continue
 
             # Check that all map are equal.
-            maps = [form.cleaned_data.get('map') for form in form_list]
-            map_error_msg = ''
-            if len(maps) != len(set(maps)):
-                map_error_msg = '같은 맵이 아닙니다.'
+            maps = {form.cleaned_data.get('map') for form in form_list}
+            map_error_msg = '같은 맵이 아닙니다.'
 
             # Check that all players are distinct.
-            players = [form.cleaned_data.get('winner') for form in form_list]
-            players.extend([form.cleaned_data.get('loser') for form in form_list])
-            duplicate_players = set([x for x in players if players.count(x) > 1])
+            player_counter = Counter()
+            for form in form_list:
+                player_counter[form.cleaned_data.get('winner')] += 1
+                player_counter[form.cleaned_data.get('loser')] += 1
+            duplicate_players = {
+                player for player, count in player_counter.items()
+                if count > 1
+            }
             duplicate_error_msg = '플레이어가 중복됩니다.'
 
             # Check that all type are equal.
@@ -275,13 +300,29 @@ class PVPDataFormSet(forms.BaseFormSet):
             for form in form_list:
                 if form.cleaned_data.get('type') != 'teamplay':
                     form.add_error('type', error_msg)
-                if len(map_error_msg) == 0:
+                if len(maps) > 1:
                     form.add_error('map', map_error_msg)
                 if form.cleaned_data.get('winner') in duplicate_players:
                     form.add_error('winner', duplicate_error_msg)
                 if form.cleaned_data.get('loser') in duplicate_players:
                     form.add_error('loser', duplicate_error_msg)
 
+    def get_existing_rounds(self):
+        """
+        Return set of rounds that already saved
+        with date, league and title of resultForm.
+        """
+        rounds = {form.cleaned_data.get('round') for form in self.forms}
+        return set(
+            Result.objects.filter(
+                date=self.resultForm.cleaned_data.get('date'),
+                league=self.resultForm.cleaned_data.get('league'),
+                title=self.resultForm.cleaned_data.get('title'),
+                round__in=rounds
+            ).values_list('round', flat=True).distinct()
+        )
+
+    @transaction.atomic
     def save_with(self, ResultForm):
         """
         To create result data, I use form, not modelform.
@@ -292,6 +333,8 @@ class PVPDataFormSet(forms.BaseFormSet):
         And it doesn't care who is winner. Just it has win_status.
         So I create two result data related winner and loser,
         but modelform only create one data. So, I use form, not modelform.
+        One game data is also created, and both results are linked to it.
+        Games of same round are linked to one match.
         """
 
         # It works fine, but using modelform is standardly recommand.
@@ -299,69 +342,65 @@ class PVPDataFormSet(forms.BaseFormSet):
         league = ResultForm.cleaned_data.get('league')
         title = ResultForm.cleaned_data.get('title')
 
-        result_list = []
+        game_list = []
         for form in self.forms:
             cleaned_data = form.cleaned_data
-            result_list.extend([
-                Result(
+            game_list.append(
+                Game(
                     date=date,
                     league=league,
                     title=title,
                     round=cleaned_data.get('round'),
                     map=cleaned_data.get('map'),
                     type=cleaned_data.get('type'),
-                    player=cleaned_data.get('winner'),
-                    race=cleaned_data.get('winner_race'),
                     winner=cleaned_data.get('winner'),
                     loser=cleaned_data.get('loser'),
                     winner_race=cleaned_data.get('winner_race'),
                     loser_race=cleaned_data.get('loser_race'),
-                    is_win=True
-                ),
-                Result(
-                    date=date,
-                    league=league,
-                    title=title,
-                    round=cleaned_data.get('round'),
-                    map=cleaned_data.get('map'),
-                    type=cleaned_data.get('type'),
-                    player=cleaned_data.get('loser'),
-                    race=cleaned_data.get('loser_race'),
-                    winner=cleaned_data.get('winner'),
-                    loser=cleaned_data.get('loser'),
-                    winner_race=cleaned_data.get('winner_race'),
-                    loser_race=cleaned_data.get('loser_race'),
-                    is_win=False
-                )]
+                    remarks=cleaned_data.get('remark'),
+                )
             )
+        Match.set_matches(game_list)
+        Game.objects.bulk_create(game_list)
+
+        result_list = []
+        for game in game_list:
+            result_list.extend(game.get_results())
         Result.objects.bulk_create(result_list)
+        # bulk_create doesn't send signals, so update streaks here.
+        PlayerStreak.update_with(result_list)
+        RaceMatchup.count_results(result_list)
+        HeadToHead.count_results(result_list)
+        Elo.update_with(result_list)
+        transaction.on_commit(
+            lambda: League.delete_statistics_cache([league.id])
+        )
+
+        # Calculate team status.
+        """
+        1. Get a league in resultForm.
+        2. If it is not proleague, pass.
+        3. Get teams of players in results at once.
+        4. Save results to teams.
+        """
+        if league.type != 'proleague':
+            return
 
-        saved_result_list = []
+        player_team_dict = ProleagueTeam.get_player_team_dict(
+            league,
+            {result.player_id for result in result_list}
+        )
+        # To save win/lose result, check that result counts of round.
+        # If it lower than MELEE_PLAYER_LIMIT, append result.
+        round_counter = Counter()
+        team_result_list = []
         for result in result_list:
-            # Calculate team status.
-
-            """
-            1. Get a league in resultForm.
-            2. If it is not proleague, continue to other result.
-            3. Get team associated player in result.
-            4. Save current result to team.
-            """
-            if league.type != 'proleague':
+            if result.player_id not in player_team_dict:
                 continue
-
-            team = ProleagueTeam.objects.filter(
-                Q(league=league) &
-                Q(players__in=[result.player])
-            ).first()
-
-            if team:
-                # To save win/lose result, check that result counts in list.
-                # If it lower than MELEE_PLAYER_LIMIT, append result.
-                if saved_result_list.count(
-                    result.round
-                ) < self.MELEE_PLAYER_LIMIT:
-                    team.save_result(result)
-                    saved_result_list.append(result.round)
+            if round_counter[result.round] < self.MELEE_PLAYER_LIMIT:
+                team_result_list.append(result)
+                round_counter[result.round] += 1
+        ProleagueTeam.count_results(league, team_result_list, player_team_dict)
 
 
 class CompareUserForm(forms.Form):
@@ -399,6 +438,47 @@ class CompareUserForm(forms.Form):
         return cleaned_data
 
 
+class ResultExportForm(forms.Form):
+    """
+    Optional filters of exported games, given as query string.
+    """
+    league = forms.ModelChoiceField(
+        queryset=League.objects.all(),
+        to_field_name='name',
+        required=False,
+    )
+    player = forms.CharField(required=False)
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+
+    def clean_player(self):
+        name = remove_space(self.cleaned_data.get('player'))
+        if not name:
+            return None
+        player = get_player(Player.objects.only('id', 'name'), name)
+        if player is None:
+            raise forms.ValidationError('선수를 찾을 수 없습니다.')
+        return player.id
+
+    def filter(self, games):
+        league = self.cleaned_data.get('league')
+        player_id = self.cleaned_data.get('player')
+        date_from = self.cleaned_data.get('date_from')
+        date_to = self.cleaned_data.get('date_to')
+
+        if league is not None:
+            games = games.filter(league=league)
+        if player_id is not None:
+            games = games.filter(
+                Q(winner_id=player_id) | Q(loser_id=player_id)
+            )
+        if date_from is not None:
+            games = games.filter(date__gte=date_from)
+        if date_to is not None:
+            games = games.filter(date__lte=date_to)
+        return games
+
+
 def get_pvp_data_formset():
     return formset_factory(
         form=PVPDataForm,
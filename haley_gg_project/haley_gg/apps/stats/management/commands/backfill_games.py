@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from haley_gg.apps.stats.models import Match
+from haley_gg.apps.stats.models import Game
+
+
+class Command(BaseCommand):
+    help = (
+        'Create games of results saved before games, '
+        'and link results to them. '
+        'Then link games saved before matches to matches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Number of games created or linked in one query.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created_count = Game.backfill(options['chunk_size'])
+            linked_count = Match.backfill(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created_count} games, '
+            f'and linked {linked_count} games to matches.'
+        ))
@@ -0,0 +1,110 @@
+import pickle
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from haley_gg.apps.stats.models import Game
+from haley_gg.apps.stats.models import Result
+from haley_gg.apps.stats.models import RaceMatchup
+from haley_gg.apps.stats.models import rebuild_derived_data
+from haley_gg.apps.stats.statistics import LeagueStatistics
+from haley_gg.apps.stats.statistics import LeagueMeleeRank
+from haley_gg.apps.stats.statistics import MapRaceStatisticsCalculator
+from haley_gg.apps.stats.statistics import PlayerStatisticsCalculator
+from haley_gg.apps.stats.synthetic import create_synthetic_data
+from haley_gg.apps.stats.utils import MatchClassifier
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure memory of data structures what stats pages keep, '
+        'on synthetic data. Data is rolled back after measurement. '
+        'Sections of league statistics are calculated in order '
+        'in the transaction, so concurrency is not measured.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--games', type=int, default=100000,
+            help='Number of synthetic games. Each game has two results.'
+        )
+        parser.add_argument('--players', type=int, default=50)
+        parser.add_argument('--leagues', type=int, default=4)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            synthetic_data = create_synthetic_data(
+                options['games'],
+                player_count=options['players'],
+                league_count=options['leagues'],
+                name_prefix='benchmark',
+            )
+            rebuild_derived_data()
+
+            self.stdout.write(
+                f'{"target":<28}{"retained":>14}{"peak":>14}{"pickled":>14}'
+            )
+            for name, target in self.get_target_dict(
+                synthetic_data
+            ).items():
+                self.write_measurement(name, *self.measure(target))
+
+            transaction.set_rollback(True)
+
+    def get_target_dict(self, synthetic_data):
+        proleague_list = [
+            league for league in synthetic_data['leagues']
+            if league.type == 'proleague'
+        ]
+        league = proleague_list[0]
+        player = synthetic_data['players'][0]
+        return {
+            # Match list of all games in one league.
+            'full league match list': lambda: MatchClassifier(
+                Game.objects.filter(league=league)
+            ).classify(),
+            'all player match list': lambda: MatchClassifier(
+                Game.objects.filter(winner=player) |
+                Game.objects.filter(loser=player)
+            ).classify(),
+            'proleague statistics': lambda: LeagueStatistics(
+                proleague_list,
+                Result.proleague.filter(league__in=proleague_list),
+                RaceMatchup.objects.filter(league__in=proleague_list),
+            ).calculate(),
+            'league melee ranks': lambda: LeagueMeleeRank(
+                Result.objects.filter(type='melee')
+            ).ranks(),
+            'map race statistics': lambda: MapRaceStatisticsCalculator(
+                RaceMatchup.objects.all()
+            ).calculate(),
+            'player statistics': lambda: PlayerStatisticsCalculator(
+                player.results.all()
+            ).calculate(),
+        }
+
+    def measure(self, target):
+        """
+        Return memory what result of target keeps, peak memory
+        while target runs, and size of result in cache.
+        """
+        tracemalloc.start()
+        started_memory, _ = tracemalloc.get_traced_memory()
+        result = target()
+        retained_memory, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        pickled_size = len(pickle.dumps(result, pickle.HIGHEST_PROTOCOL))
+        return (
+            retained_memory - started_memory,
+            peak_memory - started_memory,
+            pickled_size,
+        )
+
+    def write_measurement(self, name, retained, peak, pickled):
+        self.stdout.write(
+            f'{name:<28}'
+            f'{retained / 1024:>11.1f}KiB'
+            f'{peak / 1024:>11.1f}KiB'
+            f'{pickled / 1024:>11.1f}KiB'
+        )
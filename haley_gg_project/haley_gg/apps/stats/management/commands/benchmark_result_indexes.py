@@ -0,0 +1,130 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db import transaction
+
+from haley_gg.apps.stats.models import Result
+from haley_gg.apps.stats.synthetic import create_synthetic_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare EXPLAIN plans and timings of hot result queries '
+        'without and with result indexes, on synthetic data. '
+        'Everything is rolled back after benchmark.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--games', type=int, default=50000,
+            help='Number of synthetic games. Each game has two results.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Number of runs of each query. Best time is reported.'
+        )
+        parser.add_argument(
+            '--explain', action='store_true',
+            help='Print EXPLAIN ANALYZE plans.'
+        )
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        self.explain = options['explain']
+
+        with transaction.atomic():
+            synthetic_data = create_synthetic_data(
+                options['games'], name_prefix='benchmark'
+            )
+            # Foreign keys are checked at commit by default,
+            # and schema can't be changed while checks are pending.
+            self.check_constraints()
+            query_dict = self.get_query_dict(synthetic_data)
+
+            self.remove_indexes()
+            before_time_dict = self.run_queries(query_dict, 'Before')
+
+            self.add_indexes()
+            after_time_dict = self.run_queries(query_dict, 'After')
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{"query":<24}{"before":>12}{"after":>12}')
+        for name in query_dict:
+            self.stdout.write(
+                f'{name:<24}'
+                f'{before_time_dict[name]:>10.2f}ms'
+                f'{after_time_dict[name]:>10.2f}ms'
+            )
+
+    def get_query_dict(self, synthetic_data):
+        league = synthetic_data['leagues'][0]
+        player = synthetic_data['players'][0]
+        map = synthetic_data['maps'][0]
+        first_result = Result.objects.filter(league=league).first()
+
+        return {
+            'duplicate check': lambda: Result.objects.filter(
+                date=first_result.date,
+                league=league,
+                title=first_result.title,
+                round=first_result.round,
+            ),
+            'player streak': lambda: Result.objects.filter(
+                player=player
+            ).order_by(
+                'player', 'date', 'title', 'round'
+            ),
+            'map results': lambda: Result.objects.filter(
+                type='melee', map=map
+            ).order_by(),
+        }
+
+    def run_queries(self, query_dict, title):
+        self.analyze_table()
+        time_dict = {}
+        for name, get_queryset in query_dict.items():
+            queryset = get_queryset()
+            if self.explain:
+                self.stdout.write(f'[{title}] {name}')
+                self.stdout.write(queryset.explain(analyze=True))
+                self.stdout.write('')
+
+            elapsed_time_list = []
+            for _ in range(self.repeat):
+                started_at = time.perf_counter()
+                list(get_queryset())
+                elapsed_time_list.append(time.perf_counter() - started_at)
+            time_dict[name] = min(elapsed_time_list) * 1000
+        return time_dict
+
+    def get_existing_index_names(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Result._meta.db_table
+            )
+        return set(constraints)
+
+    def remove_indexes(self):
+        existing_index_names = self.get_existing_index_names()
+        with connection.schema_editor() as schema_editor:
+            for index in Result._meta.indexes:
+                if index.name in existing_index_names:
+                    schema_editor.remove_index(Result, index)
+
+    def add_indexes(self):
+        with connection.schema_editor() as schema_editor:
+            for index in Result._meta.indexes:
+                schema_editor.add_index(Result, index)
+
+    def check_constraints(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+    def analyze_table(self):
+        # Update planner statistics after data and indexes are changed.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'ANALYZE {connection.ops.quote_name(Result._meta.db_table)}'
+            )
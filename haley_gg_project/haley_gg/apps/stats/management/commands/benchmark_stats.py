@@ -0,0 +1,153 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db import transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from haley_gg.apps.stats import views
+from haley_gg.apps.stats.models import League
+from haley_gg.apps.stats.models import Result
+from haley_gg.apps.stats.models import RaceMatchup
+from haley_gg.apps.stats.models import PlayerStreak
+from haley_gg.apps.stats.models import rebuild_derived_data
+from haley_gg.apps.stats.statistics import LeagueMeleeRank
+from haley_gg.apps.stats.statistics import LeagueRaceStatisticsCalculator
+from haley_gg.apps.stats.statistics import MapRaceStatisticsCalculator
+from haley_gg.apps.stats.statistics import PlayerStatisticsCalculator
+from haley_gg.apps.stats.synthetic import create_synthetic_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure query count, wall time and peak memory of stats pages '
+        'and calculators on synthetic data of each size. '
+        'Data of each size is rolled back after measurement. '
+        'Sections of league statistics are calculated in order '
+        'in the transaction, so concurrency is not measured.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+',
+            default=[1000, 10000, 100000, 1000000],
+            help='Number of results. Each game has two results.'
+        )
+        parser.add_argument('--players', type=int, default=50)
+        parser.add_argument('--leagues', type=int, default=4)
+        parser.add_argument('--maps', type=int, default=8)
+        parser.add_argument('--years', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.request_factory = RequestFactory()
+        # run_concurrently doesn't use threads in transaction,
+        # because other connections don't see synthetic data.
+        self.stdout.write(
+            'League statistics are calculated in order, '
+            'concurrency is not measured.'
+        )
+
+        for size in options['sizes']:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{size} results'
+            ))
+            self.stdout.write(
+                f'{"target":<36}{"queries":>8}{"time":>12}{"peak memory":>14}'
+            )
+
+            with transaction.atomic():
+                synthetic_data = create_synthetic_data(
+                    size // 2,
+                    player_count=options['players'],
+                    league_count=options['leagues'],
+                    map_count=options['maps'],
+                    years=options['years'],
+                    name_prefix='benchmark',
+                )
+                rebuild_derived_data()
+
+                for name, target in self.get_target_dict(
+                    synthetic_data
+                ).items():
+                    self.write_measurement(name, *self.measure(target))
+
+                # Statistics of rolled back data must not be cached.
+                self.delete_statistics_cache()
+                transaction.set_rollback(True)
+
+    def get_target_dict(self, synthetic_data):
+        player, opponent = synthetic_data['players'][:2]
+        return {
+            'PlayerDetailView': lambda: self.render_view(
+                views.PlayerDetailView,
+                f'/stats/player/{player.name}/',
+                name=player.name
+            ),
+            'ProleagueView': lambda: self.render_view(
+                views.ProleagueView, '/stats/proleague/'
+            ),
+            'MapView': lambda: self.render_view(
+                views.MapView, '/stats/map/'
+            ),
+            'CompareUserView': lambda: self.render_view(
+                views.CompareUserView,
+                f'/stats/compare/?player={player.id}&opponent={opponent.id}'
+            ),
+            'LeagueMeleeRank': lambda: LeagueMeleeRank(
+                Result.proleague.get_melee_queryset()
+            ).ranks(),
+            'LeagueRaceStatisticsCalculator': lambda: (
+                LeagueRaceStatisticsCalculator(
+                    RaceMatchup.objects.filter(league__type='proleague')
+                ).calculate()
+            ),
+            'MapRaceStatisticsCalculator': lambda: (
+                MapRaceStatisticsCalculator(
+                    RaceMatchup.objects.all()
+                ).calculate()
+            ),
+            'PlayerStatisticsCalculator': lambda: (
+                PlayerStatisticsCalculator(player.results.all()).calculate()
+            ),
+            'Player.get_result_group': lambda: player.get_result_group(),
+            'PlayerStreak.rebuild': lambda: PlayerStreak.rebuild(
+                [player.id]
+            ),
+        }
+
+    def render_view(self, view_class, path, **kwargs):
+        request = self.request_factory.get(path)
+        response = view_class.as_view()(request, **kwargs)
+        # Template responses are rendered lazily.
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def delete_statistics_cache(self):
+        # Existing leagues are cached with synthetic results too.
+        League.delete_statistics_cache()
+
+    def measure(self, target):
+        """
+        Return query count, wall time and peak memory of target.
+        Cache is deleted before, to measure calculation itself.
+        """
+        self.delete_statistics_cache()
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            started_at = time.perf_counter()
+            target()
+            elapsed_time = time.perf_counter() - started_at
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return len(queries), elapsed_time, peak_memory
+
+    def write_measurement(self, name, query_count, elapsed_time, peak_memory):
+        self.stdout.write(
+            f'{name:<36}'
+            f'{query_count:>8}'
+            f'{elapsed_time * 1000:>10.1f}ms'
+            f'{peak_memory / 1024:>11.1f}KiB'
+        )
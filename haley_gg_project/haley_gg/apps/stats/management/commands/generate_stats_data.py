@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from haley_gg.apps.stats.models import League
+from haley_gg.apps.stats.models import rebuild_derived_data
+from haley_gg.apps.stats.synthetic import create_synthetic_data
+
+
+class Command(BaseCommand):
+    help = 'Create synthetic players, leagues, maps and results.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'games', type=int,
+            help='Number of games. Each game has two results.'
+        )
+        parser.add_argument('--players', type=int, default=50)
+        parser.add_argument('--leagues', type=int, default=4)
+        parser.add_argument('--maps', type=int, default=8)
+        parser.add_argument('--years', type=int, default=1)
+        parser.add_argument(
+            '--teamplay-ratio', type=float, default=0.1,
+            help='Ratio of teamplay rounds in all rounds.'
+        )
+        parser.add_argument(
+            '--prefix', default='synthetic',
+            help='Prefix of names of created players, leagues and maps.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            create_synthetic_data(
+                options['games'],
+                player_count=options['players'],
+                league_count=options['leagues'],
+                map_count=options['maps'],
+                years=options['years'],
+                teamplay_ratio=options['teamplay_ratio'],
+                name_prefix=options['prefix'],
+                seed=options['seed'],
+            )
+            rebuild_derived_data()
+        League.delete_statistics_cache()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {options['games']} games."
+        ))
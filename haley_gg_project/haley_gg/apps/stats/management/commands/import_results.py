@@ -0,0 +1,83 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from haley_gg.apps.stats.transfer import ResultImporter
+from haley_gg.apps.stats.transfer import read_csv_rows
+from haley_gg.apps.stats.transfer import read_json_rows
+from haley_gg.apps.stats.transfer import read_jsonl_rows
+
+
+# Readers by extension of file. Other files are read as CSV.
+READER_DICT = {
+    '.json': read_json_rows,
+    '.jsonl': read_jsonl_rows,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Import historical results from CSV files, '
+        'worksheets of gspread saved as JSON, or exported JSON lines. '
+        'Each row is one game, and each chunk is saved in one transaction. '
+        'Rounds already saved are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='+',
+            help='CSV, JSON or JSONL files. Format is chosen by extension.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Number of games saved in one transaction.'
+        )
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Create players and maps what are not found by name.'
+        )
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help=(
+                'Skip rebuilding streaks, matchups, Elo and standings. '
+                'Use it when importing several times, and rebuild last.'
+            )
+        )
+
+    def handle(self, *args, **options):
+        importer = ResultImporter(
+            chunk_size=options['chunk_size'],
+            create_missing=options['create_missing'],
+        )
+
+        for path in options['paths']:
+            game_count = importer.game_count
+            # utf-8-sig removes BOM of CSV saved in spreadsheet programs.
+            with open(path, encoding='utf-8-sig', newline='') as file:
+                read_rows = READER_DICT.get(
+                    os.path.splitext(path)[1].lower(), read_csv_rows
+                )
+                rows = read_rows(file)
+                try:
+                    importer.import_rows(rows)
+                except ValueError as error:
+                    raise CommandError(
+                        f'{path}: {error} '
+                        f'(saved {importer.game_count} games before)'
+                    )
+            self.stdout.write(
+                f'{path}: {importer.game_count - game_count} games'
+            )
+
+        if options['no_rebuild']:
+            # Imported games are shown in league pages before rebuild.
+            importer.delete_statistics_cache()
+        else:
+            importer.rebuild_derived_data()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {importer.game_count} games, '
+            f'and skipped {importer.skipped_game_count} games '
+            f'of rounds already saved.'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from haley_gg.apps.stats.models import HeadToHead
+
+
+class Command(BaseCommand):
+    help = 'Count head to heads of all melee results again.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            HeadToHead.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {HeadToHead.objects.count()} head to heads.'
+        ))
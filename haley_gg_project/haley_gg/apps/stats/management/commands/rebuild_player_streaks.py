@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from haley_gg.apps.stats.models import PlayerStreak
+
+
+class Command(BaseCommand):
+    help = 'Calculate streaks of all players from results again.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            PlayerStreak.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt streaks of {PlayerStreak.objects.count()} players.'
+        ))
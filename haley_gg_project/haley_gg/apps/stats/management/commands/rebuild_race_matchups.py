@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from haley_gg.apps.stats.models import RaceMatchup
+
+
+class Command(BaseCommand):
+    help = 'Count race matchups of all melee results again.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            RaceMatchup.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {RaceMatchup.objects.count()} race matchups.'
+        ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from haley_gg.apps.stats.models import ProleagueTeam
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare standings of proleague teams with results, '
+        'and repair different teams.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--league', type=int, nargs='+', dest='league_id_list',
+            help='Ids of leagues. All leagues are checked if not given.'
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only show different teams, without repairing them.'
+        )
+
+    def handle(self, *args, **options):
+        league_id_list = options['league_id_list']
+        commit = not options['check']
+
+        with transaction.atomic():
+            drifted_team_list = ProleagueTeam.rebuild(league_id_list, commit)
+
+        for team in drifted_team_list:
+            self.stdout.write(
+                f'{team.name}: '
+                f'{team.points} points, '
+                f'melee {team.melee_win}-{team.melee_lose}, '
+                f'teamplay {team.teamplay_win}-{team.teamplay_lose}'
+            )
+        if commit:
+            message = f'Repaired {len(drifted_team_list)} teams.'
+        else:
+            message = f'Found {len(drifted_team_list)} different teams.'
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from haley_gg.apps.stats.models import Elo
+
+
+class Command(BaseCommand):
+    help = 'Calculate Elo of all melee results again in chronological order.'
+
+    def handle(self, *args, **options):
+        started_at = time.perf_counter()
+        with transaction.atomic():
+            Elo.replay_all()
+        elapsed_time = time.perf_counter() - started_at
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Replayed {Elo.objects.count()} Elo rows '
+            f'in {elapsed_time:.3f} seconds.'
+        ))
@@ -0,0 +1,37 @@
+from django.conf import settings
+
+from haley_gg.apps.stats.routers import STICKY_COOKIE_NAME
+from haley_gg.apps.stats.routers import primary_reads
+from haley_gg.apps.stats.routers import is_recently_written
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Client who posted data reads from default database for a while,
+    so results posted just before are shown in statistics.
+    Results changed by anyone also make all reads sticky,
+    while statistics cache is rebuilt.
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (
+            STICKY_COOKIE_NAME in request.COOKIES
+            or is_recently_written()
+        ):
+            with primary_reads():
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+
+        if request.method not in self.SAFE_METHODS:
+            response.set_cookie(
+                STICKY_COOKIE_NAME, '1',
+                max_age=settings.STATISTICS_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
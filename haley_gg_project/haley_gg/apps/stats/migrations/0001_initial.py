@@ -0,0 +1,105 @@
+# Generated by Django 3.1.8 on 2026-10-18 11:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.expressions
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='League',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(default='', max_length=50)),
+                ('type', models.CharField(choices=[('proleague', '프로리그'), ('starleague', '스타리그'), ('otherleague', '그외 리그')], default='', max_length=50)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Map',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(default='', max_length=50)),
+                ('type', models.CharField(choices=[('melee', '밀리맵'), ('teamplay', '팀플맵')], default='melee', max_length=50)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Player',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(default='', max_length=50)),
+                ('most_race', models.CharField(choices=[('T', 'Terran'), ('P', 'Protoss'), ('Z', 'Zerg'), ('R', 'Random')], default='', max_length=50)),
+                ('joined_date', models.DateField(default=django.utils.timezone.now)),
+                ('career', models.TextField(default='아직 잠재력이 드러나지 않았습니다...')),
+                ('tier', models.CharField(choices=[('major', '메이저'), ('minor', '마이너'), ('rookie', '루키')], default='rookie', max_length=50)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Result',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(default=django.utils.timezone.now)),
+                ('title', models.CharField(default='', max_length=100)),
+                ('round', models.CharField(default='', max_length=100)),
+                ('type', models.CharField(choices=[('melee', '밀리'), ('teamplay', '팀플')], default='', max_length=20)),
+                ('race', models.CharField(choices=[('T', 'Terran'), ('P', 'Protoss'), ('Z', 'Zerg')], default='', max_length=10)),
+                ('winner_race', models.CharField(choices=[('T', 'Terran'), ('P', 'Protoss'), ('Z', 'Zerg')], default='', max_length=10)),
+                ('loser_race', models.CharField(choices=[('T', 'Terran'), ('P', 'Protoss'), ('Z', 'Zerg')], default='', max_length=10)),
+                ('is_win', models.BooleanField(default=False)),
+                ('remarks', models.CharField(blank=True, default='', max_length=100, null=True)),
+                ('league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='stats.league')),
+                ('loser', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results_loser', to='stats.player')),
+                ('map', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='stats.map')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='stats.player')),
+                ('winner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results_winner', to='stats.player')),
+            ],
+            options={
+                'ordering': [django.db.models.expressions.OrderBy(django.db.models.expressions.F('date'), descending=True), django.db.models.expressions.OrderBy(django.db.models.expressions.F('title'), descending=True), django.db.models.expressions.OrderBy(django.db.models.expressions.F('round'), descending=True), django.db.models.expressions.OrderBy(django.db.models.expressions.F('is_win'), descending=True)],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProleagueTeam',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(default='', max_length=100, unique=True)),
+                ('points', models.SmallIntegerField(default=0)),
+                ('melee_win', models.PositiveSmallIntegerField(default=0)),
+                ('melee_lose', models.PositiveSmallIntegerField(default=0)),
+                ('teamplay_win', models.PositiveSmallIntegerField(default=0)),
+                ('teamplay_lose', models.PositiveSmallIntegerField(default=0)),
+                ('league', models.ForeignKey(limit_choices_to={'type': 'proleague'}, on_delete=django.db.models.deletion.CASCADE, related_name='teams', to='stats.league')),
+                ('players', models.ManyToManyField(to='stats.Player')),
+            ],
+            options={
+                'ordering': ['-points'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Elo',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(default=django.utils.timezone.now)),
+                ('value', models.IntegerField(default=0)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='elo_list', to='stats.player')),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+    ]
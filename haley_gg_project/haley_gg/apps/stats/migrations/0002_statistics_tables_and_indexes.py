@@ -0,0 +1,190 @@
+# Generated by Django 3.1.8 on 2026-10-18 11:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.expressions
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Game',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(default=django.utils.timezone.now)),
+                ('title', models.CharField(default='', max_length=100)),
+                ('round', models.CharField(default='', max_length=100)),
+                ('type', models.CharField(choices=[('melee', '밀리'), ('teamplay', '팀플')], default='', max_length=20)),
+                ('winner_race', models.CharField(choices=[('T', 'Terran'), ('P', 'Protoss'), ('Z', 'Zerg')], default='', max_length=10)),
+                ('loser_race', models.CharField(choices=[('T', 'Terran'), ('P', 'Protoss'), ('Z', 'Zerg')], default='', max_length=10)),
+                ('remarks', models.CharField(blank=True, default='', max_length=100, null=True)),
+            ],
+            options={
+                'ordering': [django.db.models.expressions.OrderBy(django.db.models.expressions.F('date'), descending=True), django.db.models.expressions.OrderBy(django.db.models.expressions.F('title'), descending=True), django.db.models.expressions.OrderBy(django.db.models.expressions.F('round'), descending=True)],
+            },
+        ),
+        migrations.CreateModel(
+            name='HeadToHead',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('player_race', models.CharField(default='', max_length=10)),
+                ('opponent_race', models.CharField(default='', max_length=10)),
+                ('win_count', models.PositiveIntegerField(default=0)),
+                ('lose_count', models.PositiveIntegerField(default=0)),
+                ('last_played', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Match',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(default=django.utils.timezone.now)),
+                ('title', models.CharField(default='', max_length=100)),
+                ('round', models.CharField(default='', max_length=100)),
+            ],
+            options={
+                'ordering': [django.db.models.expressions.OrderBy(django.db.models.expressions.F('date'), descending=True), django.db.models.expressions.OrderBy(django.db.models.expressions.F('title'), descending=True), django.db.models.expressions.OrderBy(django.db.models.expressions.F('round'), descending=True)],
+            },
+        ),
+        migrations.CreateModel(
+            name='PlayerStreak',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('current', models.SmallIntegerField(default=0)),
+                ('longest_win', models.PositiveSmallIntegerField(default=0)),
+                ('longest_lose', models.PositiveSmallIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RaceMatchup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('winner_race', models.CharField(default='', max_length=10)),
+                ('loser_race', models.CharField(default='', max_length=10)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='elo',
+            name='result',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='elo', to='stats.result'),
+        ),
+        migrations.AddField(
+            model_name='elo',
+            name='streak',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='player',
+            name='name',
+            field=models.CharField(db_index=True, default='', max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['league', '-date', 'title', 'round'], name='result_league_match_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['player', 'date', 'title', 'round'], name='result_player_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['type', 'map'], name='result_type_map_idx'),
+        ),
+        migrations.AddField(
+            model_name='racematchup',
+            name='league',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='race_matchups', to='stats.league'),
+        ),
+        migrations.AddField(
+            model_name='racematchup',
+            name='map',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='race_matchups', to='stats.map'),
+        ),
+        migrations.AddField(
+            model_name='playerstreak',
+            name='last_result',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='stats.result'),
+        ),
+        migrations.AddField(
+            model_name='playerstreak',
+            name='player',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='streak', to='stats.player'),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='league',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='stats.league'),
+        ),
+        migrations.AddField(
+            model_name='headtohead',
+            name='map',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='stats.map'),
+        ),
+        migrations.AddField(
+            model_name='headtohead',
+            name='opponent',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='stats.player'),
+        ),
+        migrations.AddField(
+            model_name='headtohead',
+            name='player',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='head_to_heads', to='stats.player'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='league',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='games', to='stats.league'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='loser',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lost_games', to='stats.player'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='map',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='games', to='stats.map'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='match',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='games', to='stats.match'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='winner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='won_games', to='stats.player'),
+        ),
+        migrations.AddField(
+            model_name='result',
+            name='game',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='results', to='stats.game'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='racematchup',
+            unique_together={('league', 'map', 'winner_race', 'loser_race')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='match',
+            unique_together={('league', 'date', 'title', 'round')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='headtohead',
+            unique_together={('player', 'opponent', 'map', 'player_race', 'opponent_race')},
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['league', '-date', 'title', 'round'], name='game_league_match_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['winner', 'loser'], name='game_winner_loser_idx'),
+        ),
+    ]
@@ -0,0 +1,132 @@
+"""
+Results saved before games have no game and match,
+so match lists, compare and export don't show them.
+Games are created from winner's results, same as Game.backfill,
+with historical models, so this doesn't depend on current models.
+"""
+from django.db import migrations
+
+
+# Game.RESULT_FIELD_NAMES when this migration was written.
+RESULT_FIELD_ATTNAMES = [
+    'date',
+    'league_id',
+    'title',
+    'round',
+    'map_id',
+    'type',
+    'winner_id',
+    'loser_id',
+    'winner_race',
+    'loser_race',
+    'remarks',
+]
+
+CHUNK_SIZE = 5000
+
+
+def get_match_key(instance):
+    return (
+        instance.league_id,
+        instance.date,
+        instance.title,
+        instance.round,
+    )
+
+
+def set_matches(Match, game_list):
+    match_key_set = {get_match_key(game) for game in game_list}
+    league_id_set, date_set, title_set, round_set = map(
+        set, zip(*match_key_set)
+    )
+    match_dict = {}
+    for match in Match.objects.filter(
+        league_id__in=league_id_set,
+        date__in=date_set,
+        title__in=title_set,
+        round__in=round_set,
+    ):
+        match_key = get_match_key(match)
+        if match_key in match_key_set:
+            match_dict[match_key] = match
+
+    created_match_list = Match.objects.bulk_create([
+        Match(league_id=league_id, date=date, title=title, round=round)
+        for league_id, date, title, round in match_key_set
+        if (league_id, date, title, round) not in match_dict
+    ])
+    for match in created_match_list:
+        match_dict[get_match_key(match)] = match
+    for game in game_list:
+        game.match = match_dict[get_match_key(game)]
+
+
+def backfill_games(apps, schema_editor):
+    Match = apps.get_model('stats', 'Match')
+    Game = apps.get_model('stats', 'Game')
+    Result = apps.get_model('stats', 'Result')
+    results = Result.objects.filter(game__isnull=True).order_by('id')
+
+    loser_result_id_dict = {}
+    for result_id, *field_values in results.filter(
+        is_win=False
+    ).values_list('id', *RESULT_FIELD_ATTNAMES).iterator():
+        loser_result_id_dict.setdefault(
+            tuple(field_values), []
+        ).append(result_id)
+
+    last_result_id = 0
+    while True:
+        winner_results = list(results.filter(
+            is_win=True,
+            id__gt=last_result_id
+        ).values_list('id', *RESULT_FIELD_ATTNAMES)[:CHUNK_SIZE])
+        if not winner_results:
+            break
+        last_result_id = winner_results[-1][0]
+
+        game_list = [
+            Game(**dict(zip(RESULT_FIELD_ATTNAMES, field_values)))
+            for _, *field_values in winner_results
+        ]
+        set_matches(Match, game_list)
+        Game.objects.bulk_create(game_list)
+
+        linked_result_list = []
+        for (result_id, *field_values), game in zip(
+            winner_results, game_list
+        ):
+            linked_result_list.append(Result(id=result_id, game=game))
+            loser_result_id_list = loser_result_id_dict.get(
+                tuple(field_values)
+            )
+            # Loser's result may be deleted.
+            if loser_result_id_list:
+                linked_result_list.append(
+                    Result(id=loser_result_id_list.pop(), game=game)
+                )
+        Result.objects.bulk_update(linked_result_list, ['game'])
+
+    # Games saved before matches, same as Match.backfill.
+    last_game_id = 0
+    while True:
+        game_list = list(Game.objects.filter(
+            match__isnull=True,
+            id__gt=last_game_id
+        ).order_by('id')[:CHUNK_SIZE])
+        if not game_list:
+            break
+        last_game_id = game_list[-1].id
+        set_matches(Match, game_list)
+        Game.objects.bulk_update(game_list, ['match'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0002_statistics_tables_and_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_games, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,13 @@
 from abc import ABCMeta, abstractmethod
 
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 
-from haley_gg.apps.stats.models import Player
 from haley_gg.apps.stats.models import League
 from haley_gg.apps.stats.models import Map
 from haley_gg.apps.stats.utils import remove_space
+from haley_gg.apps.stats.search import get_player
+from haley_gg.apps.stats.routers import statistics_reads
 
 
 class BaseStatisticMixin(metaclass=ABCMeta):
@@ -41,12 +43,30 @@ class MapStatisticMixin(BaseStatisticMixin):
         return Map.get_total_map_statistics()
 
 
+class StatisticsReadMixin(object):
+    """
+    Views what only read statistics use replica database.
+    Template response is rendered here,
+    so queries in templates also read from replica.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with statistics_reads():
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        return response
+
+
 class PlayerSelectMixin(object):
     def get_object(self):
-        return get_object_or_404(
-            Player,
-            name__iexact=remove_space(self.kwargs['name'])
+        # Saved name is found with index of name column.
+        player = get_player(
+            self.get_queryset(), remove_space(self.kwargs['name'])
         )
+        if player is None:
+            raise Http404
+        return player
 
 
 class MapSelectMixin(object):
@@ -1,30 +1,40 @@
+import uuid
+
+from django.conf import settings
 from django.shortcuts import reverse
 from django.utils import timezone
+from django.core.cache import cache
 from django.db import models
 from django.db.models import Q
 from django.db.models import F
 from django.db.models import Count
 from django.db.models import Sum
-from django.db.models import Avg
-from django.db.models import Window
+from django.db.models import Max
+from django.db.models import Value
+from django.db.models import Subquery
 from django.db.models import OuterRef
-from django.db.models.functions import RowNumber
-from django.db.models.functions import Coalesce
 from django.db.models.functions import Cast
+from django.db.models.functions import Concat
+from django.db.models.functions import Greatest
+from django.db.models.functions import Coalesce
+
+import numpy as np
 
+from haley_gg.apps.stats import elo
 from haley_gg.apps.stats.managers import MeleeResultManager
 from haley_gg.apps.stats.managers import ProleagueResultManager
 from haley_gg.apps.stats.managers import StarleagueResultManager
 from haley_gg.apps.stats.utils import remove_space
-from haley_gg.apps.stats.utils import get_player_win_rate
-from haley_gg.apps.stats.utils import get_deduplicated_result_queryset
-from haley_gg.apps.stats.utils import PlayerMatchClassifier
-from haley_gg.apps.stats.utils import LeagueMatchClassifier
+from haley_gg.apps.stats.utils import MatchClassifier
+from haley_gg.apps.stats.utils import paginate_matches
+from haley_gg.apps.stats.utils import get_match_page_url
 from haley_gg.apps.stats.utils import stringify_streak_count
-from haley_gg.apps.stats.statistics import LeagueMeleeRank
-from haley_gg.apps.stats.statistics import PlayerRaceStatisticsCalculator
+from haley_gg.apps.stats.utils import run_concurrently
+from haley_gg.apps.stats.statistics import LeagueStatistics
+from haley_gg.apps.stats.statistics import PlayerStatisticsCalculator
 from haley_gg.apps.stats.statistics import LeagueRaceStatisticsCalculator
 from haley_gg.apps.stats.statistics import MapRaceStatisticsCalculator
+from haley_gg.apps.stats.routers import mark_recent_write
 
 
 class Player(models.Model):
@@ -32,7 +42,8 @@ class Player(models.Model):
     # remove blanks from name string.
     name = models.CharField(
         default='',
-        max_length=50
+        max_length=50,
+        db_index=True
     )
 
     most_race = models.CharField(
@@ -74,44 +85,83 @@ class Player(models.Model):
     def get_absolute_url(self):
         return reverse('stats:player', kwargs={'name': self.name})
 
-    def get_result_group(self):
+    def get_result_group(self, cursor=None):
         """
         TODO
         이 플레이어의 전적중에 팀플이 껴있는 경우
         연결된 다른 result도 갖고 와야한다.
         """
-        player_of_match = PlayerMatchClassifier(
-            Result.objects.filter(
+        games, next_cursor = paginate_matches(
+            Game.objects.filter(
                 Q(winner_id=self.id) |
                 Q(loser_id=self.id)
-            ).select_related(
-                'league', 'map', 'player', 'winner', 'loser'
-            )
+            ),
+            cursor
         )
+        player_of_match = MatchClassifier(games)
         return {
-            'match_list': player_of_match.classify()
+            'match_list': player_of_match.classify(),
+            'next_page_url': get_match_page_url(next_cursor, player=self.name),
         }
 
+    @classmethod
+    def get_profile_queryset(cls):
+        """
+        Players with streak and latest Elo,
+        so player page doesn't query them again.
+        """
+        return cls.objects.select_related('streak').annotate(
+            latest_elo=Subquery(
+                Elo.objects.filter(
+                    player=OuterRef('pk')
+                ).order_by('-date', '-id').values('value')[:1]
+            )
+        )
+
     def get_statistics(self):
+        # Win rate and race statistics are calculated in one query.
         # If no results from player, below sequences are skipped.
-        if not self.results.exists():
+        statistics = PlayerStatisticsCalculator(self.results).calculate()
+        if not statistics:
             return {}
 
-        melee_results = self.results.filter(type='melee')
-        win_and_lose_by_race_calculator = \
-            PlayerRaceStatisticsCalculator(melee_results)
-
-        streak_count = Result.get_player_streak_count(self.name)
+        streak = self.get_streak()
 
         return {
             'win_rate':
-            get_player_win_rate(self.results),
+            statistics['win_rate'],
             'race_statistics':
-            win_and_lose_by_race_calculator.calculate(),
+            statistics['race_statistics'],
             'streak':
-            stringify_streak_count(streak_count),
+            stringify_streak_count(streak.current),
+            'longest_win_streak':
+            streak.longest_win,
+            'longest_lose_streak':
+            streak.longest_lose,
+            'elo':
+            self.get_elo(),
         }
 
+    def get_elo(self):
+        # Player from get_profile_queryset has latest Elo already.
+        if hasattr(self, 'latest_elo'):
+            latest_elo = self.latest_elo
+        else:
+            latest_elo = self.elo_list.order_by(
+                '-date', '-id'
+            ).values_list('value', flat=True).first()
+        if latest_elo is None:
+            return elo.INITIAL_ELO
+        return latest_elo
+
+    def get_streak(self):
+        # Streak is saved when results are created.
+        # If it isn't saved yet, return empty one.
+        try:
+            return self.streak
+        except PlayerStreak.DoesNotExist:
+            return PlayerStreak(player=self)
+
     def get_career_and_titles(self):
         import re
         career_titles = re.findall(r'\[(.*?)\]', self.career)
@@ -140,82 +190,201 @@ class Player(models.Model):
         }
 
     def versus(self, opponent):
-        results = Result.melee.filter(
+        games = Game.objects.filter(
             (Q(winner=self.id) & Q(loser=opponent.id)) |
-            (Q(winner=opponent.id) & Q(loser=self.id))
-        ).select_related('league', 'map', 'player', 'winner', 'loser')
+            (Q(winner=opponent.id) & Q(loser=self.id)),
+            type='melee'
+        )
 
-        player_of_match = PlayerMatchClassifier(results)
+        player_of_match = MatchClassifier(games)
 
         context = {
             'results': player_of_match.classify(),
-            'statistics': results.filter(player=self.id).aggregate(
-                win_count=Sum(
-                    Cast('is_win', output_field=models.IntegerField())
-                ),
-                win_rate=Avg(
-                    Cast('is_win', output_field=models.IntegerField()) * 100
-                )
-            ),
+            'statistics': HeadToHead.get_statistics(self, opponent),
         }
         return context
 
 
-"""
-TODO
+class Elo(models.Model):
+    """
+    Elo of player after each melee result.
+    Formula is in elo module.
+    """
+
+    date = models.DateField(default=timezone.now)
 
-1. Form에서 Result를 생성할 때 Elo도 같이 계산하도록 수정.
-2. Result가 Elo를 외래키로 갖고 있어야 하는지에 대한 생각 정리.
-    Result는 한 가지의 Elo를 갖는다. 즉 1대1 관계.
-    외래키로 만들어봐야 비용만 낭비되는거 아닌가... OneonOneKey?
-    개인 전적 페이지에서 Elo그래프를 보여주고, 전적 리스트에서도 보여줘야 한다.
-    누구의 elo인지도 구분할 수 있어야 하고...
-    Result에 elo값만 저장하는 필드만 만들고??
+    value = models.IntegerField(default=0)
+
+    player = models.ForeignKey(
+        Player,
+        on_delete=models.CASCADE,
+        related_name='elo_list'
+    )
 
-     -> 당장은 미룸. 어차피 Result에서 조회만 하기 때문에 나중가서 생각하기.
-     -> 팀플레이때문에 Elo 필드는 null=True로 해야겠다.
+    # Teamplay results don't have elo, so it is nullable.
+    result = models.OneToOneField(
+        'Result',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='elo'
+    )
 
-3. Elo 계산식을 갖다 쓰되 K값 계산식 참고.
+    # Streak after this result, to calculate k value of next result.
+    streak = models.SmallIntegerField(default=0)
 
-3-1. K값 계산식에 연승값이 참조되는데, 연승 및 연패는 어떻게 계산할지 생각 정리.
+    class Meta:
+        ordering = ['date']
 
+    def __str__(self):
+        return f'{self.date} {self.player}: {self.value}'
 
-- 계산식
-m = 연승/연패값 (절댓값)
-k = 32 + 1.641^(m-1) - 1
-w = 승리 여부 ( 승=1, 패=0 )
-변동 Elo = myElo +
-    k * (
-        w - (
-            1 /
-            (
-                1 + 10^((opElo-myElo)/400)
+    @staticmethod
+    def pair_melee_results(results):
+        """
+        Pair winner and loser results of each melee game,
+        and sort games in chronological order.
+        """
+        games = {}
+        for result in results:
+            if result.type != 'melee':
+                continue
+            key = (
+                result.date,
+                result.title,
+                result.round,
+                result.league_id,
+                result.winner_id,
+                result.loser_id,
             )
+            game = games.setdefault(key, [None, None])
+            game[0 if result.is_win else 1] = result
+
+        return [
+            games[key] for key in sorted(games)
+            if all(games[key])
+        ]
+
+    @classmethod
+    def calculate_games(cls, games, player_state_dict):
+        """
+        Create Elo objects of games.
+        player_state_dict has (elo, streak) of players before first game.
+        """
+        player_id_list = list({
+            result.player_id for game in games for result in game
+        })
+        player_index_dict = {
+            player_id: index for index, player_id in enumerate(player_id_list)
+        }
+        player_state_list = [
+            player_state_dict.get(player_id, (elo.INITIAL_ELO, 0))
+            for player_id in player_id_list
+        ]
+        elo_array = np.array(
+            [state[0] for state in player_state_list], dtype=np.int64
+        )
+        streak_array = np.array(
+            [state[1] for state in player_state_list], dtype=np.int64
+        )
+        winner_index = np.array(
+            [player_index_dict[winner.player_id] for winner, _ in games],
+            dtype=np.int64
+        )
+        loser_index = np.array(
+            [player_index_dict[loser.player_id] for _, loser in games],
+            dtype=np.int64
         )
-    )
 
-ELO를 구현하기 위해 먼저 구현해야할 것
-1. 연승식
-2. 리그통계함수
-3. 통계객체
+        # Convert numpy arrays to list, database adapter can't use numpy types.
+        winner_elo, loser_elo, winner_streak, loser_streak = [
+            array.tolist() for array in elo.replay(
+                winner_index, loser_index, elo_array, streak_array
+            )
+        ]
+
+        elo_list = []
+        for index, (winner, loser) in enumerate(games):
+            elo_list.extend([
+                cls(
+                    date=winner.date,
+                    value=winner_elo[index],
+                    player_id=winner.player_id,
+                    result_id=winner.id,
+                    streak=winner_streak[index],
+                ),
+                cls(
+                    date=loser.date,
+                    value=loser_elo[index],
+                    player_id=loser.player_id,
+                    result_id=loser.id,
+                    streak=loser_streak[index],
+                ),
+            ])
+        return elo_list
 
+    @classmethod
+    def replay_all(cls):
+        """
+        Calculate Elo of all melee results from the beginning.
+        """
+        results = Result.objects.filter(type='melee').only(
+            'date', 'title', 'round', 'type', 'is_win',
+            'league_id', 'player_id', 'winner_id', 'loser_id'
+        ).order_by()
+        games = cls.pair_melee_results(results.iterator())
+
+        cls.objects.all().delete()
+        cls.objects.bulk_create(
+            cls.calculate_games(games, {}),
+            batch_size=1000
+        )
 
-"""
+    @classmethod
+    def update_with(cls, result_list):
+        """
+        Calculate Elo of created results, continuing from saved Elo.
+        If results are earlier than saved Elo, replay all results.
+        """
+        games = cls.pair_melee_results(result_list)
+        if not games:
+            return
 
+        last_result_key = cls.objects.filter(
+            result__isnull=False
+        ).order_by(
+            '-result__date', '-result__title', '-result__round'
+        ).values_list(
+            'result__date', 'result__title', 'result__round'
+        ).first()
+        first_winner = games[0][0]
+        first_result_key = (
+            first_winner.date, first_winner.title, first_winner.round
+        )
+        if last_result_key and tuple(last_result_key) >= first_result_key:
+            cls.replay_all()
+            return
 
-class Elo(models.Model):
-    date = models.DateField(default=timezone.now)
+        player_id_list = {
+            result.player_id for game in games for result in game
+        }
+        latest_elo_list = cls.objects.filter(
+            player_id__in=player_id_list
+        ).order_by(
+            'player_id', '-date', '-id'
+        ).distinct(
+            'player_id'
+        )
+        player_state_dict = {
+            latest_elo.player_id: (latest_elo.value, latest_elo.streak)
+            for latest_elo in latest_elo_list
+        }
 
-    value = models.IntegerField(default=0)
+        cls.objects.bulk_create(cls.calculate_games(games, player_state_dict))
 
-    player = models.ForeignKey(
-        Player,
-        on_delete=models.CASCADE,
-        related_name='elo_list'
-    )
 
-    class Meta:
-        ordering = ['date']
+# Version of all statistics, changed with versions of leagues.
+STATISTICS_VERSION_CACHE_KEY = 'statistics_version'
 
 
 class League(models.Model):
@@ -242,47 +411,139 @@ class League(models.Model):
 
     @classmethod
     def get_proleague_statistics(cls):
-        cls.league_list = League.objects.filter(type='proleague').only('name')
-        cls.league_queryset = Result.proleague
-
-        return cls.get_statistics()
+        return cls.get_statistics('proleague', Result.proleague)
 
     @classmethod
     def get_starleague_statistics(cls):
-        cls.league_list = League.objects.filter(type='starleague').only('name')
-        cls.league_queryset = Result.starleague
-
-        return cls.get_statistics()
+        return cls.get_statistics('starleague', Result.starleague)
 
     @classmethod
-    def get_statistics(cls):
-        match_classifier = LeagueMatchClassifier(cls.league_queryset.all())
-        cls.match_dict = match_classifier.classify()
+    def get_statistics(cls, league_type, result_manager):
+        """
+        Statistics are cached by league.
+        Only leagues what aren't in cache are calculated,
+        and cache of league is deleted when its results are changed.
+        """
+        league_list = list(
+            League.objects.filter(type=league_type).only('name')
+        )
+        # Versions are read before calculation.
+        cache_key_dict = cls.get_statistics_cache_key_dict(league_list)
+        cached_statistics = cache.get_many(cache_key_dict.keys())
 
-        race_statistics_calculator = \
-            LeagueRaceStatisticsCalculator(
-                cls.league_queryset.get_melee_queryset()
+        uncached_league_list = [
+            league for cache_key, league in cache_key_dict.items()
+            if cache_key not in cached_statistics
+        ]
+        if uncached_league_list:
+            league_statistics = LeagueStatistics(
+                uncached_league_list,
+                result_manager.filter(league__in=uncached_league_list),
+                RaceMatchup.objects.filter(league__in=uncached_league_list),
             )
-        cls.race_statistics_dict = \
-            race_statistics_calculator.calculate()
+            # Standings are calculated from results,
+            # so they are cached with other statistics.
+            # All sections are run concurrently in one pool.
+            task_dict = league_statistics.get_tasks()
+            task_dict['standings'] = (
+                lambda: ProleagueTeam.get_standings_tables(
+                    uncached_league_list
+                )
+            )
+            section_dict = run_concurrently(task_dict)
+            standings_tables = section_dict['standings']
+            league_statistics = league_statistics.combine(section_dict)
+            calculated_statistics = {
+                cache_key: {
+                    **league_statistics[league.name],
+                    'standings': standings_tables[league.id],
+                }
+                for cache_key, league in cache_key_dict.items()
+                if cache_key not in cached_statistics
+            }
+            cache.set_many(
+                calculated_statistics,
+                timeout=settings.STATISTICS_CACHE_TIMEOUT
+            )
+            cached_statistics.update(calculated_statistics)
 
-        melee_rank = LeagueMeleeRank(cls.league_queryset.get_melee_queryset())
-        cls.rank_data_dict = melee_rank.ranks()
+        return {
+            league.name: cached_statistics[cache_key]
+            for cache_key, league in cache_key_dict.items()
+        }
 
-        league_statistics = {}
+    def get_match_page(self, cursor=None):
+        games, next_cursor = paginate_matches(
+            Game.objects.filter(league=self),
+            cursor
+        )
+        match_classifier = MatchClassifier(games)
+        return {
+            'match_list': match_classifier.classify(),
+            'next_page_url': get_match_page_url(next_cursor, league=self.name),
+        }
 
-        for league in cls.league_list:
-            race_statistics = \
-                cls.race_statistics_dict.get_or_create(league.name)
-            matches = cls.match_dict.get_or_create(league.name)
-            rank_data = cls.rank_data_dict.get_or_create(league.name)
+    @staticmethod
+    def get_statistics_cache_key(league_id, version):
+        return f'league_statistics:{league_id}:{version}'
 
-            league_statistics[league.name] = {
-                'race_statistics': race_statistics,
-                'matches': matches,
-                'rank': rank_data,
-            }
-        return league_statistics
+    @staticmethod
+    def get_statistics_version():
+        """
+        Return version what is changed with cache of any league,
+        such as when results, teams, players or maps are changed.
+        """
+        return cache.get(STATISTICS_VERSION_CACHE_KEY, 0)
+
+    @staticmethod
+    def get_statistics_version_cache_key(league_id):
+        return f'league_statistics_version:{league_id}'
+
+    @classmethod
+    def get_statistics_cache_key_dict(cls, league_list):
+        """
+        Return dict of cache key and league.
+        Key has current version of league,
+        so statistics calculated before version is changed
+        are saved in key what isn't read anymore.
+        """
+        version_dict = cache.get_many([
+            cls.get_statistics_version_cache_key(league.id)
+            for league in league_list
+        ])
+        return {
+            cls.get_statistics_cache_key(
+                league.id,
+                version_dict.get(
+                    cls.get_statistics_version_cache_key(league.id), 0
+                )
+            ): league
+            for league in league_list
+        }
+
+    @classmethod
+    def delete_statistics_cache(cls, league_id_list=None):
+        """
+        Change versions of statistics of leagues,
+        so cached statistics are not read anymore, and expire.
+        If league_id_list is None, delete cache of all leagues.
+        """
+        if league_id_list is None:
+            league_id_list = League.objects.values_list('id', flat=True)
+        version = uuid.uuid4().hex
+        cache.set_many(
+            {
+                STATISTICS_VERSION_CACHE_KEY: version,
+                **{
+                    cls.get_statistics_version_cache_key(league_id): version
+                    for league_id in league_id_list
+                },
+            },
+            timeout=None
+        )
+        # Statistics are calculated again from default database,
+        # until changed results are replicated.
+        mark_recent_write()
 
 
 class Map(models.Model):
@@ -312,7 +573,7 @@ class Map(models.Model):
     def get_result_count(self):
         if self.is_teamplay_map():
             return '팀플맵은 집계하지 않습니다.'
-        return get_deduplicated_result_queryset(self.results).count()
+        return self.games.count()
 
     def is_teamplay_map(self):
         return self.type == 'teamplay'
@@ -320,7 +581,7 @@ class Map(models.Model):
     @classmethod
     def get_total_map_statistics(cls):
         race_statistics_calculator = \
-            MapRaceStatisticsCalculator(Result.melee)
+            MapRaceStatisticsCalculator(RaceMatchup.objects.all())
         race_statistics_dict = \
             race_statistics_calculator.calculate()
 
@@ -344,7 +605,7 @@ class Map(models.Model):
             return {}
 
         race_statistics_calculator = \
-            LeagueRaceStatisticsCalculator(self.results)
+            LeagueRaceStatisticsCalculator(self.race_matchups.all())
         race_statistics_dict = \
             race_statistics_calculator.calculate()
 
@@ -401,24 +662,154 @@ class ProleagueTeam(models.Model):
     def __str__(self):
         return self.name
 
-    # update counts.
-    def save_result(self, result):
-        if result.is_win:
-            self.points += 1
-        else:
-            self.points -= 1
+    @classmethod
+    def get_player_team_dict(cls, league, player_id_list):
+        """
+        Return dict of player id and team id in league.
+        If player is in several teams, team of most points is used.
+        """
+        player_team_dict = {}
+        for player_id, team_id in cls.objects.filter(
+            league=league,
+            players__in=player_id_list
+        ).values_list('players', 'id'):
+            player_team_dict.setdefault(player_id, team_id)
+        return player_team_dict
+
+    @staticmethod
+    def get_changed_counts(result):
+        changed_counts = {'points': 1 if result.is_win else -1}
+        type = 'melee' if result.type == 'melee' else 'teamplay'
+        status = 'win' if result.is_win else 'lose'
+        changed_counts[f'{type}_{status}'] = 1
+        return changed_counts
 
-        if result.type == 'melee':
-            if result.is_win:
-                self.melee_win += 1
-            else:
-                self.melee_lose += 1
-        else:
-            if result.is_win:
-                self.teamplay_win += 1
-            else:
-                self.teamplay_lose += 1
-        self.save()
+    @classmethod
+    def count_results(cls, league, result_list, player_team_dict):
+        """
+        Add results to teams of players in one update for each team.
+        Counts are added with F expressions,
+        so concurrent saves don't lose updates.
+        """
+        counter = {}
+        for result in result_list:
+            team_id = player_team_dict.get(result.player_id)
+            if team_id is None:
+                continue
+            team_counter = counter.setdefault(team_id, {})
+            for field_name, count in cls.get_changed_counts(result).items():
+                team_counter[field_name] = \
+                    team_counter.get(field_name, 0) + count
+
+        for team_id, team_counter in counter.items():
+            cls.objects.filter(league=league, id=team_id).update(**{
+                field_name: F(field_name) + count
+                for field_name, count in team_counter.items()
+            })
+
+    STANDINGS_FIELD_NAMES = [
+        'points',
+        'melee_win',
+        'melee_lose',
+        'teamplay_win',
+        'teamplay_lose',
+    ]
+
+    @classmethod
+    def calculate_standings(cls, league_id_list=None):
+        """
+        Count standings of teams from results in one aggregate query.
+        Team wins or loses a round only once,
+        even if several players of team played in that round.
+        If league_id_list is None, calculate teams of all leagues.
+
+        Return dict of team id and counts.
+        """
+        teams = cls.objects.all()
+        if league_id_list is not None:
+            teams = teams.filter(league_id__in=league_id_list)
+
+        round_key = Concat(
+            Cast('players__results__date', models.CharField()),
+            Value('/'),
+            'players__results__title',
+            Value('/'),
+            'players__results__round',
+            output_field=models.CharField()
+        )
+        melee = Q(players__results__type='melee')
+        win = Q(players__results__is_win=True)
+
+        standings_dict = {
+            team_id: dict.fromkeys(cls.STANDINGS_FIELD_NAMES, 0)
+            for team_id in teams.values_list('id', flat=True)
+        }
+        # Filter before annotate, so only results of team's league are joined.
+        grouped_teams = teams.filter(
+            players__results__league=F('league')
+        ).values('id').annotate(
+            melee_win=Count(round_key, distinct=True, filter=melee & win),
+            melee_lose=Count(round_key, distinct=True, filter=melee & ~win),
+            teamplay_win=Count(round_key, distinct=True, filter=~melee & win),
+            teamplay_lose=Count(
+                round_key, distinct=True, filter=~melee & ~win
+            ),
+        ).order_by()
+        for grouped_team in grouped_teams:
+            standings = standings_dict[grouped_team.pop('id')]
+            standings.update(grouped_team)
+            standings['points'] = \
+                standings['melee_win'] + standings['teamplay_win'] - \
+                standings['melee_lose'] - standings['teamplay_lose']
+        return standings_dict
+
+    @classmethod
+    def get_standings_tables(cls, league_list):
+        """
+        Return dict of league id and standings of its teams,
+        sorted by points.
+        """
+        league_id_list = [league.id for league in league_list]
+        standings_dict = cls.calculate_standings(league_id_list)
+        standings_tables = {league_id: [] for league_id in league_id_list}
+        for team in cls.objects.filter(
+            league_id__in=league_id_list
+        ).only('name', 'league_id'):
+            standings_tables[team.league_id].append({
+                'name': team.name,
+                **standings_dict[team.id],
+            })
+        for standings_table in standings_tables.values():
+            standings_table.sort(key=lambda standings: -standings['points'])
+        return standings_tables
+
+    @classmethod
+    def rebuild(cls, league_id_list=None, commit=True):
+        """
+        Compare saved counts of teams with counts from results,
+        and repair different teams in one bulk update.
+        If commit is False, only find different teams.
+
+        Return list of different teams with counts from results.
+        """
+        standings_dict = cls.calculate_standings(league_id_list)
+        drifted_team_list = []
+        for team in cls.objects.filter(id__in=standings_dict):
+            standings = standings_dict[team.id]
+            if all(
+                getattr(team, field_name) == count
+                for field_name, count in standings.items()
+            ):
+                continue
+            for field_name, count in standings.items():
+                setattr(team, field_name, count)
+            drifted_team_list.append(team)
+
+        if commit:
+            cls.objects.bulk_update(
+                drifted_team_list, cls.STANDINGS_FIELD_NAMES
+            )
+        return drifted_team_list
 
     def get_total_win(self):
         return self.melee_win + self.teamplay_win
@@ -427,6 +818,367 @@ class ProleagueTeam(models.Model):
         return self.melee_lose + self.teamplay_lose
 
 
+class Match(models.Model):
+    """
+    Round of league what games are played in.
+    Teamplay round has several games, and melee round has one game.
+    Games are grouped by id of match, not by string of match name.
+    """
+
+    date = models.DateField(
+        default=timezone.now,
+    )
+
+    league = models.ForeignKey(
+        League,
+        on_delete=models.CASCADE,
+        related_name='matches'
+    )
+
+    title = models.CharField(
+        default='',
+        max_length=100,
+    )
+
+    round = models.CharField(
+        default='',
+        max_length=100,
+    )
+
+    class Meta:
+        ordering = [
+            F('date').desc(),
+            F('title').desc(),
+            F('round').desc(),
+        ]
+        unique_together = [
+            'league',
+            'date',
+            'title',
+            'round',
+        ]
+
+    def __str__(self):
+        return f'{self.date} | {self.league} {self.title} {self.round}'
+
+    @staticmethod
+    def get_match_key(instance):
+        # Key of match from game or result, without fetching league.
+        return (
+            instance.league_id,
+            instance.date,
+            instance.title,
+            instance.round,
+        )
+
+    @classmethod
+    def get_match_dict(cls, match_key_list):
+        """
+        Return dict of match key and match.
+        Matches what don't exist are created.
+        """
+        match_key_set = set(match_key_list)
+        if not match_key_set:
+            return {}
+        league_id_set, date_set, title_set, round_set = map(
+            set, zip(*match_key_set)
+        )
+
+        match_dict = {}
+        for match in cls.objects.filter(
+            league_id__in=league_id_set,
+            date__in=date_set,
+            title__in=title_set,
+            round__in=round_set,
+        ):
+            match_key = cls.get_match_key(match)
+            if match_key in match_key_set:
+                match_dict[match_key] = match
+
+        created_match_list = cls.objects.bulk_create([
+            cls(league_id=league_id, date=date, title=title, round=round)
+            for league_id, date, title, round in match_key_set
+            if (league_id, date, title, round) not in match_dict
+        ])
+        for match in created_match_list:
+            match_dict[cls.get_match_key(match)] = match
+        return match_dict
+
+    @classmethod
+    def set_matches(cls, game_list):
+        """
+        Set matches to games, before games are saved.
+        """
+        match_dict = cls.get_match_dict(
+            cls.get_match_key(game) for game in game_list
+        )
+        for game in game_list:
+            game.match = match_dict[cls.get_match_key(game)]
+
+    @classmethod
+    def backfill(cls, chunk_size=5000):
+        """
+        Set matches to games what don't have match.
+
+        Return number of updated games.
+        """
+        updated_count = 0
+        while True:
+            game_list = list(Game.objects.filter(
+                match__isnull=True
+            ).only('league_id', 'date', 'title', 'round')[:chunk_size])
+            if not game_list:
+                break
+            cls.set_matches(game_list)
+            Game.objects.bulk_update(game_list, ['match'])
+            updated_count += len(game_list)
+        return updated_count
+
+
+class Game(models.Model):
+    """
+    One row for each game.
+    Result has two rows for each game, one for winner and one for loser,
+    so match lists had to deduplicate results with DISTINCT ON.
+    Match lists and counts of games are read from this table,
+    and results are kept for statistics of each player.
+    """
+
+    # Fields what winner's and loser's results of game have same values.
+    RESULT_FIELD_NAMES = [
+        'date',
+        'league',
+        'title',
+        'round',
+        'map',
+        'type',
+        'winner',
+        'loser',
+        'winner_race',
+        'loser_race',
+        'remarks',
+    ]
+
+    date = models.DateField(
+        default=timezone.now,
+    )
+
+    league = models.ForeignKey(
+        League,
+        on_delete=models.CASCADE,
+        related_name='games'
+    )
+
+    title = models.CharField(
+        default='',
+        max_length=100,
+    )
+
+    round = models.CharField(
+        default='',
+        max_length=100,
+    )
+
+    map = models.ForeignKey(
+        Map,
+        related_name='games',
+        on_delete=models.CASCADE)
+
+    type = models.CharField(
+        default='',
+        max_length=20,
+        choices=(
+            ('melee', '밀리'),
+            ('teamplay', '팀플')
+        )
+    )
+
+    winner = models.ForeignKey(
+        Player,
+        on_delete=models.CASCADE,
+        related_name='won_games'
+    )
+
+    loser = models.ForeignKey(
+        Player,
+        on_delete=models.CASCADE,
+        related_name='lost_games'
+    )
+
+    winner_race = models.CharField(
+        default='',
+        max_length=10,
+        choices=(
+            ('T', 'Terran'),
+            ('P', 'Protoss'),
+            ('Z', 'Zerg'),
+        )
+    )
+
+    loser_race = models.CharField(
+        default='',
+        max_length=10,
+        choices=(
+            ('T', 'Terran'),
+            ('P', 'Protoss'),
+            ('Z', 'Zerg'),
+        )
+    )
+
+    remarks = models.CharField(
+        default='',
+        max_length=100,
+        null=True,
+        blank=True,
+    )
+
+    # Games saved before matches are linked to matches
+    # by 0003_backfill_games migration.
+    match = models.ForeignKey(
+        Match,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='games'
+    )
+
+    class Meta:
+        ordering = [
+            F('date').desc(),
+            F('title').desc(),
+            F('round').desc(),
+        ]
+        indexes = [
+            # Match list of league.
+            models.Index(
+                fields=['league', '-date', 'title', 'round'],
+                name='game_league_match_idx'
+            ),
+            # Player.versus
+            models.Index(
+                fields=['winner', 'loser'],
+                name='game_winner_loser_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f'{self.date} | {self.get_match_name()} {self.map} | '
+            f'{self.winner}({self.winner_race}) vs '
+            f'{self.loser}({self.loser_race})'
+        )
+
+    def get_match_name(self):
+        return f'{self.league} {self.title} {self.round}'
+
+    @classmethod
+    def get_result_field_attnames(cls):
+        # Use ids of foreign keys, so related objects aren't fetched.
+        return [
+            cls._meta.get_field(field_name).attname
+            for field_name in cls.RESULT_FIELD_NAMES
+        ]
+
+    def get_results(self):
+        """
+        Return winner's and loser's results of this game, not saved.
+        Save game before, so results have id of game.
+        """
+        field_values = {
+            attname: getattr(self, attname)
+            for attname in self.get_result_field_attnames()
+        }
+        return [
+            Result(
+                game=self,
+                player_id=self.winner_id,
+                race=self.winner_race,
+                is_win=True,
+                **field_values
+            ),
+            Result(
+                game=self,
+                player_id=self.loser_id,
+                race=self.loser_race,
+                is_win=False,
+                **field_values
+            ),
+        ]
+
+    @classmethod
+    def get_or_create_for_result(cls, result):
+        """
+        Return game of result saved one by one, such as in admin page.
+        Game created with mirror result of other side is used,
+        otherwise game is created with match.
+        """
+        field_values = {
+            attname: getattr(result, attname)
+            for attname in cls.get_result_field_attnames()
+        }
+        game = cls.objects.filter(**field_values).exclude(
+            results__is_win=result.is_win
+        ).order_by('id').first()
+        if game is None:
+            game = cls(**field_values)
+            Match.set_matches([game])
+            game.save()
+        return game
+
+    @classmethod
+    def backfill(cls, chunk_size=5000):
+        """
+        Create games of results what don't have game,
+        and link winner's and loser's results to it.
+        Results of same game have same values in RESULT_FIELD_NAMES.
+
+        Return number of created games.
+        """
+        field_names = cls.get_result_field_attnames()
+        results = Result.objects.filter(game__isnull=True).order_by('id')
+
+        loser_result_id_dict = {}
+        for result_id, *field_values in results.filter(
+            is_win=False
+        ).values_list('id', *field_names).iterator():
+            loser_result_id_dict.setdefault(
+                tuple(field_values), []
+            ).append(result_id)
+
+        created_count = 0
+        last_result_id = 0
+        while True:
+            winner_results = list(results.filter(
+                is_win=True,
+                id__gt=last_result_id
+            ).values_list('id', *field_names)[:chunk_size])
+            if not winner_results:
+                break
+            last_result_id = winner_results[-1][0]
+
+            game_list = cls.objects.bulk_create([
+                cls(**dict(zip(field_names, field_values)))
+                for _, *field_values in winner_results
+            ])
+
+            linked_result_list = []
+            for (result_id, *field_values), game in zip(
+                winner_results, game_list
+            ):
+                linked_result_list.append(Result(id=result_id, game=game))
+                loser_result_id_list = loser_result_id_dict.get(
+                    tuple(field_values)
+                )
+                # Loser's result may be deleted.
+                if loser_result_id_list:
+                    linked_result_list.append(
+                        Result(id=loser_result_id_list.pop(), game=game)
+                    )
+            Result.objects.bulk_update(linked_result_list, ['game'])
+            created_count += len(game_list)
+        return created_count
+
+
 class Result(models.Model):
     date = models.DateField(
         default=timezone.now,
@@ -513,6 +1265,16 @@ class Result(models.Model):
         default=False,
     )
 
+    # Game of this result. Results saved before games are linked
+    # to games by 0003_backfill_games migration.
+    game = models.ForeignKey(
+        Game,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='results'
+    )
+
     remarks = models.CharField(
         default='',
         max_length=100,
@@ -532,6 +1294,25 @@ class Result(models.Model):
             F('round').desc(),
             F('is_win').desc(),
         ]
+        indexes = [
+            # Duplicate check in PVPDataFormSet.
+            # It has all fields of duplicate check,
+            # so database can check it only with index.
+            models.Index(
+                fields=['league', '-date', 'title', 'round'],
+                name='result_league_match_idx'
+            ),
+            # Streaks of player.
+            models.Index(
+                fields=['player', 'date', 'title', 'round'],
+                name='result_player_date_idx'
+            ),
+            # Map statistics.
+            models.Index(
+                fields=['type', 'map'],
+                name='result_type_map_idx'
+            ),
+        ]
 
     def __str__(self):
         str_list = [
@@ -561,89 +1342,525 @@ class Result(models.Model):
         ]
         return ''.join(str_list)
 
-    results_queryset = None
-    numbered_queryset = None
-    numbered_most_recent_win_and_lose_queryset = None
-    streak_queryset = None
 
-    @classmethod
-    def get_all_player_streak_count(cls):
+class PlayerStreak(models.Model):
+    """
+    Streaks of player saved on results creation.
+    Calculating streaks from results needs to scan all results of player,
+    so keep them updated incrementally and read it in player page.
+    """
+
+    player = models.OneToOneField(
+        Player,
+        on_delete=models.CASCADE,
+        related_name='streak'
+    )
+    # Positive value is win streak, and negative value is lose streak.
+    current = models.SmallIntegerField(
+        default=0
+    )
+    longest_win = models.PositiveSmallIntegerField(
+        default=0
+    )
+    longest_lose = models.PositiveSmallIntegerField(
+        default=0
+    )
+    # Most recent result counted in streaks.
+    last_result = models.ForeignKey(
+        Result,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+
+    def __str__(self):
+        return f'{self.player}: {stringify_streak_count(self.current)}'
+
+    @staticmethod
+    def get_result_order_key(result):
+        # Same as Result's ordering, but in ascending order.
+        return (result.date, result.title, result.round)
+
+    def count(self, result):
+        if result.is_win:
+            self.current = max(self.current, 0) + 1
+            self.longest_win = max(self.longest_win, self.current)
+        else:
+            self.current = min(self.current, 0) - 1
+            self.longest_lose = max(self.longest_lose, -self.current)
+        self.last_result = result
+
+    def is_counted_after(self, result):
         """
-        How to get player's streaks?
+        Check that result can be counted after last counted result.
+        If not, streaks must be calculated again from all results.
+        """
+        if self.last_result is None:
+            return self.current == 0
+        return self.get_result_order_key(self.last_result) < \
+            self.get_result_order_key(result)
 
-        1.  Give row numbers to all results.
-            It sorted in ascending order by date,
-            partitioned by player name.
-        2.  Find a most recent win and lose result,
-            annotates its row number to queryset.
-        3.  Substract win result's row number to lose result's row number.
-            It is streak!
+    @classmethod
+    def update_with(cls, result_list):
         """
-        cls.set_results_queryset_to_all_results_queryset()
-        cls.calculate_streak_count()
+        Count created results to saved streaks.
+        If any result is earlier than saved streak, rebuild that player.
+        """
+        result_list_by_player = {}
+        for result in sorted(result_list, key=cls.get_result_order_key):
+            result_list_by_player.setdefault(result.player_id, []).append(
+                result
+            )
 
-        return cls.streak_queryset
+        streak_dict = cls.objects.select_related('last_result').in_bulk(
+            result_list_by_player.keys(),
+            field_name='player_id'
+        )
+
+        created_streak_list = []
+        updated_streak_list = []
+        rebuilt_player_id_list = []
+        for player_id, player_result_list in result_list_by_player.items():
+            streak = streak_dict.get(player_id)
+            if streak is None:
+                streak = cls(player_id=player_id)
+                created_streak_list.append(streak)
+            elif streak.is_counted_after(player_result_list[0]):
+                updated_streak_list.append(streak)
+            else:
+                rebuilt_player_id_list.append(player_id)
+                continue
+
+            for result in player_result_list:
+                streak.count(result)
+
+        cls.objects.bulk_create(created_streak_list)
+        cls.objects.bulk_update(
+            updated_streak_list,
+            ['current', 'longest_win', 'longest_lose', 'last_result']
+        )
+        if rebuilt_player_id_list:
+            cls.rebuild(rebuilt_player_id_list)
 
     @classmethod
-    def set_results_queryset_to_all_results_queryset(cls):
-        cls.results_queryset = Result.objects.all()
+    def rebuild(cls, player_id_list=None):
+        """
+        Calculate streaks from all results in one scan.
+        If player_id_list is None, rebuild streaks of all players.
+        """
+        results = Result.objects.only(
+            'date', 'title', 'round', 'player_id', 'is_win'
+        ).order_by(
+            'player_id', 'date', 'title', 'round'
+        )
+        streaks = cls.objects.all()
+        if player_id_list is not None:
+            results = results.filter(player_id__in=player_id_list)
+            streaks = streaks.filter(player_id__in=player_id_list)
+
+        streak_dict = {}
+        for result in results.iterator():
+            if result.player_id not in streak_dict:
+                streak_dict[result.player_id] = cls(player_id=result.player_id)
+            streak_dict[result.player_id].count(result)
+
+        streaks.delete()
+        cls.objects.bulk_create(streak_dict.values())
+
+
+class MeleeResultCounter(models.Model):
+    """
+    Table what counts winner's results of melee games by key.
+    After you inherit this class,
+    you must set KEY_FIELD_NAMES what are unique together.
+    """
+
+    KEY_FIELD_NAMES = []
+
+    class Meta:
+        abstract = True
+
+    @staticmethod
+    def is_counted(result):
+        return result.type == 'melee' and result.is_win
 
     @classmethod
-    def get_player_streak_count(cls, player_name):
-        cls.filter_only_result_queryset_related_with_player(player_name)
-        cls.calculate_streak_count()
-        return cls.streak_queryset.first()['count']
+    def add_counts(cls, changed_fields_dict, create=True):
+        """
+        Update row of each key with its dict of changed fields.
+        If create is True, rows what don't exist are created before,
+        with ignore_conflicts. Rows created by other transaction
+        at the same time don't raise IntegrityError, and are updated.
+        Keys are sorted, so transactions lock rows in same order.
+        """
+        key_list = sorted(changed_fields_dict)
+        if create:
+            cls.objects.bulk_create(
+                [
+                    cls(**dict(zip(cls.KEY_FIELD_NAMES, key)))
+                    for key in key_list
+                ],
+                ignore_conflicts=True
+            )
+        for key in key_list:
+            cls.objects.filter(
+                **dict(zip(cls.KEY_FIELD_NAMES, key))
+            ).update(**changed_fields_dict[key])
+
+
+class RaceMatchup(MeleeResultCounter):
+    """
+    Count of melee games by league, map and races.
+    Race statistics are calculated from this table,
+    so they don't need to scan all results.
+    Only winner's result is counted, because each game has two results.
+    """
+
+    league = models.ForeignKey(
+        League,
+        on_delete=models.CASCADE,
+        related_name='race_matchups'
+    )
+    map = models.ForeignKey(
+        Map,
+        on_delete=models.CASCADE,
+        related_name='race_matchups'
+    )
+    winner_race = models.CharField(
+        default='',
+        max_length=10
+    )
+    loser_race = models.CharField(
+        default='',
+        max_length=10
+    )
+    count = models.PositiveIntegerField(
+        default=0
+    )
+
+    KEY_FIELD_NAMES = [
+        'league_id',
+        'map_id',
+        'winner_race',
+        'loser_race',
+    ]
+
+    class Meta:
+        unique_together = [
+            'league', 'map', 'winner_race', 'loser_race'
+        ]
+
+    def __str__(self):
+        return f'{self.league} {self.map} ' \
+            f'{self.winner_race}>{self.loser_race}: {self.count}'
 
     @classmethod
-    def filter_only_result_queryset_related_with_player(cls, player_name):
-        cls.results_queryset = Result.objects.filter(
-            player__name__iexact=player_name
+    def count_results(cls, result_list, amount=1):
+        """
+        Add amount to matchups of given results.
+        To uncount deleted results, give -1 as amount.
+        """
+        counter = {}
+        for result in result_list:
+            if not cls.is_counted(result):
+                continue
+            key = (
+                result.league_id,
+                result.map_id,
+                result.winner_race,
+                result.loser_race,
+            )
+            counter[key] = counter.get(key, 0) + amount
+
+        # Don't create matchup when uncounting,
+        # league or map may be deleting with its results.
+        cls.add_counts(
+            {
+                key: {'count': F('count') + count}
+                for key, count in counter.items()
+            },
+            create=amount > 0
         )
 
     @classmethod
-    def calculate_streak_count(cls):
-        cls.numbering_on_results_queryset_partition_by_player()
-        cls.find_most_recent_win_and_lose_row_number_queryset()
-        cls.calculate_streak_count_with_win_and_lose_row_number_queryset()
+    def rebuild(cls):
+        """
+        Count all melee results again in one grouped query.
+        """
+        grouped_results = Result.objects.filter(
+            type='melee',
+            is_win=True,
+        ).values(
+            'league_id', 'map_id', 'winner_race', 'loser_race'
+        ).annotate(
+            count=Count('id')
+        ).order_by()
+
+        cls.objects.all().delete()
+        cls.objects.bulk_create([
+            cls(**grouped_result) for grouped_result in grouped_results
+        ])
+
+
+class HeadToHead(MeleeResultCounter):
+    """
+    Wins and loses of player against opponent in melee games,
+    by map and races.
+    Each game is counted twice, once from winner and once from loser,
+    so rows of player have all games of player against opponent.
+    Only winner's result is counted, because each game has two results.
+
+    last_played is the latest date of counted games.
+    It isn't moved back when games are uncounted, until rebuild.
+    """
+
+    player = models.ForeignKey(
+        Player,
+        on_delete=models.CASCADE,
+        related_name='head_to_heads'
+    )
+    opponent = models.ForeignKey(
+        Player,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    map = models.ForeignKey(
+        Map,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    player_race = models.CharField(
+        default='',
+        max_length=10
+    )
+    opponent_race = models.CharField(
+        default='',
+        max_length=10
+    )
+    win_count = models.PositiveIntegerField(
+        default=0
+    )
+    lose_count = models.PositiveIntegerField(
+        default=0
+    )
+    last_played = models.DateField(
+        null=True,
+        blank=True
+    )
+
+    KEY_FIELD_NAMES = [
+        'player_id',
+        'opponent_id',
+        'map_id',
+        'player_race',
+        'opponent_race',
+    ]
+
+    class Meta:
+        unique_together = [
+            'player', 'opponent', 'map', 'player_race', 'opponent_race'
+        ]
+
+    def __str__(self):
+        return f'{self.player}({self.player_race}) vs ' \
+            f'{self.opponent}({self.opponent_race}) {self.map}: ' \
+            f'{self.win_count}-{self.lose_count}'
+
+    @staticmethod
+    def get_keys(winner_id, loser_id, map_id, winner_race, loser_race):
+        """
+        Return keys of winner's row and loser's row of game,
+        in order of KEY_FIELD_NAMES.
+        """
+        return (
+            (winner_id, loser_id, map_id, winner_race, loser_race),
+            (loser_id, winner_id, map_id, loser_race, winner_race),
+        )
 
     @classmethod
-    def numbering_on_results_queryset_partition_by_player(cls):
-        cls.numbered_queryset = cls.results_queryset.annotate(
-            row_number=Window(
-                expression=RowNumber(),
-                partition_by=F('player__name'),
-                order_by=cls._meta.ordering
+    def count_results(cls, result_list, amount=1):
+        """
+        Add amount to head to heads of given results.
+        To uncount deleted results, give -1 as amount.
+        """
+        counter = {}
+        for result in result_list:
+            if not cls.is_counted(result):
+                continue
+            winner_key, loser_key = cls.get_keys(
+                result.winner_id,
+                result.loser_id,
+                result.map_id,
+                result.winner_race,
+                result.loser_race,
             )
-        ).order_by(*cls._meta.ordering)
+            for key, field_name in [
+                (winner_key, 'win_count'),
+                (loser_key, 'lose_count'),
+            ]:
+                key_counter = counter.setdefault(key, {
+                    'win_count': 0,
+                    'lose_count': 0,
+                    'last_played': result.date,
+                })
+                key_counter[field_name] += amount
+                key_counter['last_played'] = max(
+                    key_counter['last_played'], result.date
+                )
+
+        changed_fields_dict = {}
+        for key, key_counter in counter.items():
+            changed_fields = {
+                'win_count': F('win_count') + key_counter['win_count'],
+                'lose_count': F('lose_count') + key_counter['lose_count'],
+            }
+            if amount > 0:
+                last_played = Value(
+                    key_counter['last_played'],
+                    output_field=models.DateField()
+                )
+                changed_fields['last_played'] = Greatest(
+                    Coalesce('last_played', last_played),
+                    last_played
+                )
+            changed_fields_dict[key] = changed_fields
+        # Don't create head to head when uncounting,
+        # player or map may be deleting with its results.
+        cls.add_counts(changed_fields_dict, create=amount > 0)
 
     @classmethod
-    def find_most_recent_win_and_lose_row_number_queryset(cls):
-        cls.numbered_most_recent_win_and_lose_queryset = \
-            cls.numbered_queryset.filter(
-                player__name=OuterRef('player__name')
-            ).order_by(
-                'is_win',
-                *cls._meta.ordering
-            ).distinct('is_win').values('row_number')
+    def rebuild(cls):
+        """
+        Count all melee results again in one grouped query.
+        """
+        grouped_results = Result.objects.filter(
+            type='melee',
+            is_win=True,
+        ).values(
+            'winner_id', 'loser_id', 'map_id', 'winner_race', 'loser_race'
+        ).annotate(
+            count=Count('id'),
+            last_played=Max('date'),
+        ).order_by()
+
+        head_to_head_dict = {}
+        for grouped_result in grouped_results:
+            count = grouped_result.pop('count')
+            last_played = grouped_result.pop('last_played')
+            winner_key, loser_key = cls.get_keys(**grouped_result)
+            for key, field_name in [
+                (winner_key, 'win_count'),
+                (loser_key, 'lose_count'),
+            ]:
+                if key not in head_to_head_dict:
+                    head_to_head_dict[key] = cls(
+                        last_played=last_played,
+                        **dict(zip(cls.KEY_FIELD_NAMES, key))
+                    )
+                head_to_head = head_to_head_dict[key]
+                setattr(
+                    head_to_head,
+                    field_name,
+                    getattr(head_to_head, field_name) + count
+                )
+                head_to_head.last_played = max(
+                    head_to_head.last_played, last_played
+                )
+
+        cls.objects.all().delete()
+        cls.objects.bulk_create(head_to_head_dict.values())
+
+    @classmethod
+    def get_statistics(cls, player, opponent):
+        """
+        Return wins and loses of player against opponent,
+        in total and by map and races.
+        """
+        statistics = {
+            'win_count': 0,
+            'lose_count': 0,
+            'game_count': 0,
+            'win_rate': None,
+            'last_played': None,
+            'maps': {},
+            'races': {},
+        }
+        for head_to_head in cls.objects.filter(
+            player=player,
+            opponent=opponent
+        ).select_related('map').order_by('map__name'):
+            win_lose = (head_to_head.win_count, head_to_head.lose_count)
+            statistics['win_count'] += win_lose[0]
+            statistics['lose_count'] += win_lose[1]
+            for split_name, key in [
+                ('maps', head_to_head.map.name),
+                ('races', f'{head_to_head.player_race}'
+                          f'v{head_to_head.opponent_race}'),
+            ]:
+                split = statistics[split_name].setdefault(key, [0, 0])
+                split[0] += win_lose[0]
+                split[1] += win_lose[1]
+            if head_to_head.last_played and (
+                statistics['last_played'] is None or
+                head_to_head.last_played > statistics['last_played']
+            ):
+                statistics['last_played'] = head_to_head.last_played
+
+        statistics['game_count'] = \
+            statistics['win_count'] + statistics['lose_count']
+        if statistics['game_count']:
+            statistics['win_rate'] = \
+                statistics['win_count'] * 100 / statistics['game_count']
+        return statistics
 
     @classmethod
-    def calculate_streak_count_with_win_and_lose_row_number_queryset(cls):
-        cls.streak_queryset = cls.numbered_queryset.annotate(
-            win_row_number=cls.numbered_most_recent_win_and_lose_queryset[:1],
-            lose_row_number=cls.numbered_most_recent_win_and_lose_queryset[1:2],
+    def get_matrix(cls):
+        """
+        Return players what played melee games,
+        and rows of [win, lose] against each other player.
+        Cell is None if they didn't play.
+        """
+        grouped_head_to_heads = cls.objects.values(
+            'player_id', 'opponent_id'
         ).annotate(
-            count=Coalesce(
-                F('win_row_number'),
-                0
-            ) - Coalesce(
-                F('lose_row_number'),
-                0
+            total_win_count=Sum('win_count'),
+            total_lose_count=Sum('lose_count'),
+        ).order_by()
+
+        cell_dict = {}
+        for grouped_head_to_head in grouped_head_to_heads:
+            cell_dict[(
+                grouped_head_to_head['player_id'],
+                grouped_head_to_head['opponent_id'],
+            )] = (
+                grouped_head_to_head['total_win_count'],
+                grouped_head_to_head['total_lose_count'],
             )
-        ).order_by(
-            'player__name'
-        ).distinct(
-            'player__name'
-        ).values(
-            'player__name',
-            'count'
+
+        player_id_set = {player_id for player_id, _ in cell_dict}
+        player_list = list(
+            Player.objects.filter(id__in=player_id_set).only('name')
         )
+        rows = [
+            (player, [
+                cell_dict.get((player.id, opponent.id))
+                for opponent in player_list
+            ])
+            for player in player_list
+        ]
+        return {
+            'players': player_list,
+            'rows': rows,
+        }
+
+
+def rebuild_derived_data():
+    """
+    Results are saved with bulk_create without signals,
+    so tables derived from results must be rebuilt.
+    """
+    PlayerStreak.rebuild()
+    RaceMatchup.rebuild()
+    HeadToHead.rebuild()
+    Elo.replay_all()
@@ -0,0 +1,124 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db import OperationalError
+from django.db import connections
+
+
+"""
+Statistics are read from replica database, when it is configured.
+Only reads in statistics_reads() go to replica,
+and writes always go to default database.
+
+Reads go to default database instead,
+- when replica is not configured, or it can't be connected.
+- in transaction of default database.
+- while request is sticky after writes,
+  so writer reads its own results before they are replicated.
+"""
+
+# Seconds to use default database after replica can't be connected.
+REPLICA_RETRY_SECONDS = 30
+
+# Cookie of client who wrote recently.
+STICKY_COOKIE_NAME = 'read_primary'
+
+# Statistics cache is rebuilt after results are changed.
+# It must not be rebuilt with results what aren't replicated yet,
+# so all statistics are read from default database for a while.
+RECENT_WRITE_CACHE_KEY = 'statistics_recent_write'
+
+# App label of table of database cache.
+CACHE_APP_LABEL = 'django_cache'
+
+reading_statistics = ContextVar('reading_statistics', default=False)
+sticky_to_primary = ContextVar('sticky_to_primary', default=False)
+
+# Time until which replica isn't used, by alias.
+unavailable_until_dict = {}
+
+
+@contextmanager
+def statistics_reads():
+    token = reading_statistics.set(True)
+    try:
+        yield
+    finally:
+        reading_statistics.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    token = sticky_to_primary.set(True)
+    try:
+        yield
+    finally:
+        sticky_to_primary.reset(token)
+
+
+def mark_recent_write():
+    cache.set(
+        RECENT_WRITE_CACHE_KEY, True,
+        timeout=settings.STATISTICS_STICKY_SECONDS
+    )
+
+
+def is_recently_written():
+    return cache.get(RECENT_WRITE_CACHE_KEY, False)
+
+
+def is_available(alias):
+    if time.monotonic() < unavailable_until_dict.get(alias, 0):
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except OperationalError:
+        unavailable_until_dict[alias] = (
+            time.monotonic() + REPLICA_RETRY_SECONDS
+        )
+        return False
+    return True
+
+
+def get_replica_alias():
+    """
+    Return alias of replica, or None to use default database.
+    """
+    alias = settings.STATISTICS_DATABASE
+    if alias == DEFAULT_DB_ALIAS or alias not in settings.DATABASES:
+        return None
+    if not is_available(alias):
+        return None
+    return alias
+
+
+class StatisticsRouter:
+    """
+    Route reads of statistics to replica database.
+    Returning None lets Django use default database.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not reading_statistics.get() or sticky_to_primary.get():
+            return None
+        # Versions of statistics in database cache must not lag.
+        if model._meta.app_label == CACHE_APP_LABEL:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return get_replica_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replica has same rows as default database.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Schema of replica is replicated from default database.
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,190 @@
+import time
+import threading
+import unicodedata
+from bisect import bisect_left
+from difflib import get_close_matches
+
+from haley_gg.apps.stats.models import Player
+
+
+"""
+Player names are searched in memory of each process.
+
+- Name is normalised by removing spaces and casefold,
+  so Latin names are matched without case.
+- Hangul syllables are decomposed into jamo (NFD),
+  so syllable still being typed matches prefix. (예: '헤이' -> '헤일리')
+- Query made of only initial consonants matches chosung of name.
+  (예: 'ㅎㅇㄹ' -> '헤일리')
+
+Index is dropped when player is saved or deleted in this process.
+Players changed in other processes are loaded after INDEX_TIMEOUT.
+"""
+
+# Seconds until index is loaded again.
+INDEX_TIMEOUT = 60
+
+DEFAULT_LIMIT = 10
+
+# Lowest similarity of difflib, to suggest misspelled names.
+FUZZY_CUTOFF = 0.6
+
+HANGUL_FIRST_SYLLABLE = 0xAC00
+HANGUL_LAST_SYLLABLE = 0xD7A3
+# Number of syllables which have same initial consonant. (21 * 28)
+HANGUL_CHOSUNG_SIZE = 588
+CHOSUNG_LIST = 'ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ'
+
+
+def normalize_name(name):
+    name = unicodedata.normalize('NFC', name or '')
+    return ''.join(name.split()).casefold()
+
+
+def decompose_name(normalized_name):
+    return unicodedata.normalize('NFD', normalized_name)
+
+
+def get_chosung(normalized_name):
+    chosung_list = []
+    for char in normalized_name:
+        code = ord(char)
+        if HANGUL_FIRST_SYLLABLE <= code <= HANGUL_LAST_SYLLABLE:
+            char = CHOSUNG_LIST[
+                (code - HANGUL_FIRST_SYLLABLE) // HANGUL_CHOSUNG_SIZE
+            ]
+        chosung_list.append(char)
+    return ''.join(chosung_list)
+
+
+def is_chosung_query(normalized_name):
+    return all(char in CHOSUNG_LIST for char in normalized_name)
+
+
+class PlayerNameIndex:
+    """
+    Normalised names of all players, loaded lazily.
+    Names are sorted by decomposed name, to find prefix with bisect.
+    """
+
+    def __init__(self, timeout=INDEX_TIMEOUT):
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.entries = None
+        self.loaded_at = 0
+
+    def load(self):
+        entries = []
+        for name in Player.objects.order_by().values_list('name', flat=True):
+            normalized_name = normalize_name(name)
+            entries.append((
+                decompose_name(normalized_name),
+                get_chosung(normalized_name),
+                name,
+            ))
+        entries.sort()
+        return entries
+
+    def get_entries(self):
+        entries = self.entries
+        if (
+            entries is None
+            or time.monotonic() - self.loaded_at > self.timeout
+        ):
+            with self.lock:
+                # Other thread may load index while waiting.
+                if (
+                    self.entries is None
+                    or time.monotonic() - self.loaded_at > self.timeout
+                ):
+                    self.entries = self.load()
+                    self.loaded_at = time.monotonic()
+                entries = self.entries
+        return entries
+
+    def invalidate(self):
+        self.entries = None
+
+    def get_name(self, name):
+        """
+        Return same saved name, or saved name matched without spaces
+        and case when only one player has it, or None.
+        """
+        decomposed_name = decompose_name(normalize_name(name))
+        entries = self.get_entries()
+        name_list = []
+        for entry_decomposed_name, _, entry_name in entries[
+            bisect_left(entries, (decomposed_name,)):
+        ]:
+            if entry_decomposed_name != decomposed_name:
+                break
+            name_list.append(entry_name)
+        if name in name_list:
+            return name
+        # 'Haley' and 'haley' can both be saved.
+        if len(name_list) == 1:
+            return name_list[0]
+        return None
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Return names in order of exact, prefix, chosung,
+        containing, and similar names.
+        """
+        normalized_query = normalize_name(query)
+        if not normalized_query:
+            return []
+
+        decomposed_query = decompose_name(normalized_query)
+        entries = self.get_entries()
+        name_list = []
+
+        def add(name):
+            if name not in name_list:
+                name_list.append(name)
+            return len(name_list) >= limit
+
+        # Exact name is first entry of prefix matches.
+        for decomposed_name, _, name in entries[
+            bisect_left(entries, (decomposed_query,)):
+        ]:
+            if not decomposed_name.startswith(decomposed_query):
+                break
+            if add(name):
+                return name_list
+
+        if is_chosung_query(normalized_query):
+            for _, chosung, name in entries:
+                if chosung.startswith(normalized_query) and add(name):
+                    return name_list
+
+        for decomposed_name, _, name in entries:
+            if decomposed_query in decomposed_name and add(name):
+                return name_list
+
+        name_dict = {
+            decomposed_name: name for decomposed_name, _, name in entries
+        }
+        for decomposed_name in get_close_matches(
+            decomposed_query, name_dict, n=limit, cutoff=FUZZY_CUTOFF
+        ):
+            if add(name_dict[decomposed_name]):
+                break
+        return name_list
+
+
+player_name_index = PlayerNameIndex()
+
+
+def get_player(queryset, name):
+    """
+    Return player of same saved name, or of name matched by index, or None.
+    Same name is looked up in database too,
+    because player added in other process may not be in index yet.
+    """
+    index_name = player_name_index.get_name(name)
+    player_dict = {
+        player.name: player
+        for player in queryset.filter(name__in=[name, index_name])
+    }
+    return player_dict.get(name) or player_dict.get(index_name)
@@ -0,0 +1,84 @@
+import hashlib
+
+from django.db.models import Max
+from django.db.models import Count
+
+
+"""
+Statistics of pages are converted to JSON values.
+Model objects and statistic classes are replaced with names and dicts.
+"""
+
+# Change it when format of JSON is changed,
+# so clients don't keep responses of previous format.
+API_VERSION = 1
+
+
+def serialize_race_statistics(race_statistics):
+    # Map without race matchups has None.
+    if race_statistics is None:
+        return None
+    return dict(race_statistics.items())
+
+
+def serialize_rank(rank_data_dict):
+    return {
+        category: [
+            {'player': rank_data.player_name, 'value': rank_data.value}
+            for rank_data in rank_data_list
+        ]
+        for category, rank_data_list in rank_data_dict.items()
+    }
+
+
+def serialize_league_statistics(league_statistics):
+    # Matches are left out, they are read from export of results.
+    return {
+        league_name: {
+            'race_statistics': serialize_race_statistics(
+                statistics['race_statistics']
+            ),
+            'rank': serialize_rank(statistics['rank']),
+            'standings': statistics['standings'],
+        }
+        for league_name, statistics in league_statistics.items()
+    }
+
+
+def serialize_map_statistics(map_statistics):
+    # Teamplay map has empty dict, and map without games has None.
+    return {
+        map.name: serialize_race_statistics(race_statistics or None)
+        for map, race_statistics in map_statistics.items()
+    }
+
+
+def serialize_player_statistics(statistics):
+    if not statistics:
+        return {}
+    return {
+        **statistics,
+        'race_statistics': serialize_race_statistics(
+            statistics['race_statistics']
+        ),
+    }
+
+
+def get_etag(scope, queryset, statistics_version):
+    """
+    Strong ETag from version of statistics,
+    and the latest id and date and count of queryset.
+    Version is changed when results are edited, and when players,
+    maps or teams are changed, which don't change queryset.
+    Count changes when a result is deleted, even if it isn't the latest.
+    """
+    state = queryset.order_by().aggregate(
+        latest_id=Max('id'),
+        latest_date=Max('date'),
+        count=Count('id'),
+    )
+    value = (
+        f'{API_VERSION}:{scope}:{statistics_version}:'
+        f'{state["latest_id"]}:{state["latest_date"]}:{state["count"]}'
+    )
+    return hashlib.sha1(value.encode()).hexdigest()
@@ -0,0 +1,230 @@
+from django.db import connection
+from django.db import transaction
+from django.db.models.signals import pre_save
+from django.db.models.signals import post_save
+from django.db.models.signals import post_delete
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+from haley_gg.apps.stats.models import Player
+from haley_gg.apps.stats.models import League
+from haley_gg.apps.stats.models import Map
+from haley_gg.apps.stats.models import Result
+from haley_gg.apps.stats.models import Match
+from haley_gg.apps.stats.models import Game
+from haley_gg.apps.stats.models import ProleagueTeam
+from haley_gg.apps.stats.models import PlayerStreak
+from haley_gg.apps.stats.models import RaceMatchup
+from haley_gg.apps.stats.models import HeadToHead
+from haley_gg.apps.stats.models import Elo
+from haley_gg.apps.stats.search import player_name_index
+
+
+"""
+Results created in PVPDataFormSet are saved with bulk_create,
+so these receivers only handle results saved or deleted one by one,
+such as admin page.
+"""
+
+
+@receiver(post_save, sender=Result)
+@receiver(post_delete, sender=Result)
+def rebuild_player_streak(sender, instance, **kwargs):
+    # Player may be deleted together with results,
+    # so rebuild streak after transaction is committed.
+    player_id = instance.player_id
+    transaction.on_commit(lambda: PlayerStreak.rebuild([player_id]))
+
+
+@receiver(post_save, sender=Result)
+@receiver(post_delete, sender=Result)
+def rebuild_team_standings(sender, instance, **kwargs):
+    # Team wins or loses a round only once,
+    # so standings of league are counted again from results.
+    league_id = instance.league_id
+    transaction.on_commit(lambda: ProleagueTeam.rebuild([league_id]))
+
+
+@receiver(post_save, sender=Result)
+@receiver(post_delete, sender=Result)
+def replay_elo(sender, instance, **kwargs):
+    # Changed winner or date changes Elo of all later results,
+    # and deleted result removes its Elo row, so all results are replayed.
+    on_commit_once(Elo.replay_all)
+
+
+@receiver(post_save, sender=Result)
+def update_game(sender, instance, created, raw=False, **kwargs):
+    # Game of result has same values with result.
+    if raw:
+        return
+    if instance.game_id is None:
+        if created:
+            add_game(instance)
+        return
+    field_values = {
+        attname: getattr(instance, attname)
+        for attname in Game.get_result_field_attnames()
+    }
+    match_key = Match.get_match_key(instance)
+    Game.objects.filter(pk=instance.game_id).update(
+        match=Match.get_match_dict([match_key])[match_key],
+        **field_values
+    )
+    update_mirror_results(instance, field_values)
+
+
+def update_mirror_results(result, field_values):
+    """
+    Copy edited values of one side of game to result of other side,
+    so winner's and loser's results of game don't disagree.
+    Mirror result is saved only when it is changed,
+    so receivers of its save don't save edited result again.
+    """
+    mirror_results = Result.objects.filter(
+        game_id=result.game_id
+    ).exclude(pk=result.pk)
+    for mirror_result in mirror_results:
+        side = 'winner' if mirror_result.is_win else 'loser'
+        changed_values = {
+            attname: value
+            for attname, value in {
+                **field_values,
+                'player_id': field_values[f'{side}_id'],
+                'race': field_values[f'{side}_race'],
+            }.items()
+            if getattr(mirror_result, attname) != value
+        }
+        if not changed_values:
+            continue
+        previous_player_id = mirror_result.player_id
+        for attname, value in changed_values.items():
+            setattr(mirror_result, attname, value)
+        mirror_result.save()
+        # Streak of previous player is rebuilt without this game.
+        if 'player_id' in changed_values:
+            transaction.on_commit(
+                lambda player_id=previous_player_id:
+                PlayerStreak.rebuild([player_id])
+            )
+
+
+def add_game(result):
+    # Result created without game is paired with its mirror result.
+    game = Game.get_or_create_for_result(result)
+    Result.objects.filter(pk=result.pk).update(game=game)
+    result.game = game
+
+
+@receiver(post_delete, sender=Result)
+def delete_empty_game(sender, instance, **kwargs):
+    if instance.game_id is None:
+        return
+    Game.objects.filter(
+        pk=instance.game_id,
+        results__isnull=True
+    ).delete()
+
+
+@receiver(pre_save, sender=Result)
+def uncount_changed_result(sender, instance, raw=False, **kwargs):
+    # Uncount result what saved before, and count it again after saving.
+    if raw or instance.pk is None:
+        return
+    previous_result = Result.objects.filter(pk=instance.pk).first()
+    if previous_result:
+        RaceMatchup.count_results([previous_result], -1)
+        HeadToHead.count_results([previous_result], -1)
+
+
+@receiver(post_save, sender=Result)
+def count_result(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    RaceMatchup.count_results([instance])
+    HeadToHead.count_results([instance])
+
+
+@receiver(post_delete, sender=Result)
+def uncount_result(sender, instance, **kwargs):
+    RaceMatchup.count_results([instance], -1)
+    HeadToHead.count_results([instance], -1)
+
+
+@receiver(pre_save, sender=Result)
+def delete_previous_league_statistics_cache(sender, instance, **kwargs):
+    # League of result may be changed.
+    if instance.pk is None:
+        return
+    previous_league_id = Result.objects.filter(
+        pk=instance.pk
+    ).values_list('league_id', flat=True).first()
+    if previous_league_id:
+        delete_league_statistics_cache_on_commit([previous_league_id])
+
+
+@receiver(post_save, sender=Result)
+@receiver(post_delete, sender=Result)
+def delete_result_league_statistics_cache(sender, instance, **kwargs):
+    delete_league_statistics_cache_on_commit([instance.league_id])
+
+
+@receiver(post_save, sender=League)
+@receiver(post_delete, sender=League)
+def delete_league_statistics_cache(sender, instance, **kwargs):
+    delete_league_statistics_cache_on_commit([instance.id])
+
+
+@receiver(post_save, sender=ProleagueTeam)
+@receiver(post_delete, sender=ProleagueTeam)
+def delete_team_league_statistics_cache(sender, instance, **kwargs):
+    # Standings of teams are cached with statistics of league.
+    delete_league_statistics_cache_on_commit([instance.league_id])
+
+
+@receiver(m2m_changed, sender=ProleagueTeam.players.through)
+def delete_team_players_league_statistics_cache(
+    sender, instance, action, **kwargs
+):
+    if not action.startswith('post_'):
+        return
+    # Players can be added to team from player side.
+    if isinstance(instance, ProleagueTeam):
+        delete_league_statistics_cache_on_commit([instance.league_id])
+    else:
+        delete_league_statistics_cache_on_commit(None)
+
+
+@receiver(post_save, sender=Player)
+@receiver(post_delete, sender=Player)
+@receiver(post_save, sender=Map)
+@receiver(post_delete, sender=Map)
+def delete_all_league_statistics_cache(sender, instance, **kwargs):
+    # Names of players and maps are in statistics of all leagues.
+    delete_league_statistics_cache_on_commit(None)
+
+
+@receiver(post_save, sender=Player)
+@receiver(post_delete, sender=Player)
+def invalidate_player_name_index(sender, instance, **kwargs):
+    # Index is loaded again with committed names on next search.
+    transaction.on_commit(player_name_index.invalidate)
+
+
+def delete_league_statistics_cache_on_commit(league_id_list):
+    # If cache is deleted before commit,
+    # other request can cache statistics with previous results again.
+    transaction.on_commit(
+        lambda: League.delete_statistics_cache(league_id_list)
+    )
+
+
+def on_commit_once(func):
+    # Results deleted together, such as with their player,
+    # run func once after commit, not once for each result.
+    if any(
+        scheduled_func == func
+        for _, scheduled_func in connection.run_on_commit
+    ):
+        return
+    transaction.on_commit(func)
@@ -1,138 +1,209 @@
 from abc import ABCMeta
+from array import array
 from abc import abstractmethod
 
+from django.db import connections
 from django.db.models import F
 from django.db.models import Count
 from django.db.models import Avg
 from django.db.models import Sum
 from django.db.models import IntegerField
+from django.db.models import Window
 from django.db.models.functions import Cast
+from django.db.models.functions import RowNumber
 
-from haley_gg.apps.stats.utils import get_deduplicated_result_queryset
 from haley_gg.apps.stats.utils import BaseDataDict
+from haley_gg.apps.stats.utils import run_concurrently
 
 
-class RaceStatisticsDict(dict):
+class RaceStatisticsDict:
+    """
+    각 종족마다 상대 종족에 대한 승, 패 수를 갖고 있다.
+    Counts are kept in one flat array of 3 x 3 x 2 values,
+    not in nested dicts of lists.
+    It reads like dict of race, dict of opponent race and [win, lose],
+    so templates use it same as before.
+    """
+    __slots__ = ('counts',)
+
+    RACE_LIST = ['T', 'Z', 'P']
+    RACE_INDEX = {race: index for index, race in enumerate(RACE_LIST)}
     WIN_INDEX = 0
     LOSE_INDEX = 1
 
     def __init__(self):
-        """
-        각 종족마다 상대 종족에 대한 승, 패 수를 갖고 있다.
-        """
-        self.update({
-            'T': {'T': [0, 0], 'Z': [0, 0], 'P': [0, 0]},
-            'Z': {'T': [0, 0], 'Z': [0, 0], 'P': [0, 0]},
-            'P': {'T': [0, 0], 'Z': [0, 0], 'P': [0, 0]}
-        })
+        self.counts = array('l', [0]) * (len(self.RACE_LIST) ** 2 * 2)
+
+    def get_index(self, race, opponent_race, win_or_lose_index):
+        return (
+            self.RACE_INDEX[race] * len(self.RACE_LIST) +
+            self.RACE_INDEX[opponent_race]
+        ) * 2 + win_or_lose_index
+
+    def count(self, winner_race, loser_race, count=1):
+        self.counts[
+            self.get_index(winner_race, loser_race, self.WIN_INDEX)
+        ] += count
+        self.counts[
+            self.get_index(loser_race, winner_race, self.LOSE_INDEX)
+        ] += count
+
+    def count_only_winner(self, winner_race, loser_race, count=1):
+        self.counts[
+            self.get_index(winner_race, loser_race, self.WIN_INDEX)
+        ] += count
+
+    def __getitem__(self, race):
+        # Raise KeyError for other keys, so templates find methods.
+        return {
+            opponent_race: [
+                self.counts[self.get_index(race, opponent_race, index)]
+                for index in (self.WIN_INDEX, self.LOSE_INDEX)
+            ]
+            for opponent_race in self.RACE_LIST
+        }
+
+    def __iter__(self):
+        return iter(self.RACE_LIST)
+
+    def __len__(self):
+        return len(self.RACE_LIST)
 
-    def count(self, winner_race, loser_race):
-        self[winner_race][loser_race][self.WIN_INDEX] += 1
-        self[loser_race][winner_race][self.LOSE_INDEX] += 1
+    def __eq__(self, other):
+        return dict(self.items()) == other
 
-    def count_only_winner(self, winner_race, loser_race):
-        self[winner_race][loser_race][self.WIN_INDEX] += 1
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def keys(self):
+        return list(self.RACE_LIST)
+
+    def values(self):
+        return [self[race] for race in self.RACE_LIST]
+
+    def items(self):
+        return [(race, self[race]) for race in self.RACE_LIST]
+
+    def get(self, race, default=None):
+        if race not in self.RACE_INDEX:
+            return default
+        return self[race]
 
 
 class BaseRaceStatisticsCalculator(metaclass=ABCMeta):
     """
     Calculate win and lose count by each race on melee results.
+    Queryset is grouped by races in database,
+    so only grouped rows are fetched instead of all results.
     """
 
     def __init__(self, queryset):
-        self.deduplicate_queryset(queryset)
+        self._queryset = self.group_queryset(queryset).order_by()
 
-    def deduplicate_queryset(self, queryset):
-        self._queryset = get_deduplicated_result_queryset(queryset)
+    @abstractmethod
+    def group_queryset(self, queryset):
+        pass
 
     @abstractmethod
     def calculate(self):
         pass
 
 
-class LeagueRaceStatisticsCalculator(BaseRaceStatisticsCalculator):
-    """
-    Calculate win and lose count by each race on melee results.
-    """
+class RaceStatisticsDataDict(BaseDataDict):
+    data_class = RaceStatisticsDict
+
+    def save(self, key, winner_race, loser_race, count):
+        race_statistics = self.get_or_create(key)
+        race_statistics.count(winner_race, loser_race, count)
 
+
+class BaseRaceMatchupStatisticsCalculator(BaseRaceStatisticsCalculator):
     """
-    TODO
-    구조 개선 필요.
-    밑의 MapRaceSt~~와 너무 닮았는데 key만 다르다!
+    Calculate win and lose count by each race on race matchup queryset.
+    Race matchups are already counted by league, map and races,
+    so only a few rows are summed up by key.
+    After you inherit this class, you must set key to group by.
     """
 
-    class LeagueRaceStatisticsDict(BaseDataDict):
-        data_class = RaceStatisticsDict
+    key = None
 
-        def save(self, result):
-            race_statistics = self.get_or_create(result.league.name)
-            race_statistics.count(result.winner_race, result.loser_race)
+    def __init__(self, race_matchup_queryset):
+        super().__init__(race_matchup_queryset)
+        self.race_statistics_dict = RaceStatisticsDataDict()
 
-    def __init__(self, queryset):
-        super().__init__(queryset)
-        self.race_statistics_dict = self.LeagueRaceStatisticsDict()
+    def group_queryset(self, queryset):
+        return queryset.values(
+            self.key, 'winner_race', 'loser_race'
+        ).annotate(
+            total=Sum('count')
+        )
 
     def calculate(self):
-        for result in self._queryset:
-            self.race_statistics_dict.save(result)
+        for row in self._queryset:
+            self.race_statistics_dict.save(
+                row.get(self.key),
+                row.get('winner_race'),
+                row.get('loser_race'),
+                row.get('total'),
+            )
         return self.race_statistics_dict
 
 
-class MapRaceStatisticsCalculator(BaseRaceStatisticsCalculator):
-    class MapRaceStatisticsDict(BaseDataDict):
-        data_class = RaceStatisticsDict
+class LeagueRaceStatisticsCalculator(BaseRaceMatchupStatisticsCalculator):
+    key = 'league__name'
 
-        def save(self, result):
-            race_statistics = self.get_or_create(result.map.name)
-            race_statistics.count(result.winner_race, result.loser_race)
 
-    def __init__(self, queryset):
-        super().__init__(queryset)
-        self.race_statistics_dict = self.MapRaceStatisticsDict()
+class MapRaceStatisticsCalculator(BaseRaceMatchupStatisticsCalculator):
+    key = 'map__name'
 
-    def calculate(self):
-        for result in self._queryset:
-            self.race_statistics_dict.save(result)
-        return self.race_statistics_dict
 
+class PlayerStatisticsCalculator(BaseRaceStatisticsCalculator):
+    """
+    Calculate win rate and race statistics of player together,
+    from one grouped query on player's results.
+    Win rate counts all results, and race statistics count melee results.
+    """
 
-class PlayerRaceStatisticsCalculator(BaseRaceStatisticsCalculator):
-    def __init__(self, queryset):
-        super().__init__(queryset)
-        self.player_race = ''
-        self.opponent_race = ''
-        self.__calculated_data = RaceStatisticsDict()
+    def group_queryset(self, queryset):
+        return queryset.values(
+            'type', 'is_win', 'winner_race', 'loser_race'
+        ).annotate(
+            total=Count('id')
+        )
 
     def calculate(self):
         """
-        Set result variable to RaceStatistics object.
-        Because, this object only count player results.
-        So result is not categorize with keys
-        such as league name, map name etc.
-        """
-        for result in self._queryset:
-            self.__set_races(result)
-
-            self.__calculated_data.count_only_winner(
-                self.player_race, self.opponent_race
-            )
-        return self.__calculated_data
-
-    def __set_races(self, result):
-        """
-        In this calculator, fix up winner as player.
+        Return empty dict if player has no results.
         """
-        # Suppose player were won.
-        self.player_race = result.winner_race
-        self.opponent_race = result.loser_race
+        result_count = 0
+        win_count = 0
+        race_statistics = RaceStatisticsDict()
+        for row in self._queryset:
+            result_count += row.get('total')
+            if row.get('is_win'):
+                win_count += row.get('total')
+                player_race = row.get('winner_race')
+                opponent_race = row.get('loser_race')
+            else:
+                player_race = row.get('loser_race')
+                opponent_race = row.get('winner_race')
+
+            if row.get('type') == 'melee':
+                race_statistics.count_only_winner(
+                    player_race, opponent_race, row.get('total')
+                )
 
-        # But player lose, swap both race.
-        if not result.is_win:
-            self.player_race, self.opponent_race = \
-                self.opponent_race, self.player_race
+        if result_count == 0:
+            return {}
+        return {
+            'win_rate': win_count * 100 / result_count,
+            'race_statistics': race_statistics,
+        }
 
 
 class RankData:
+    __slots__ = ('league_name', 'player_name', 'category', 'value')
+
     def __init__(self, league_name, player_name, category, value):
         self.league_name = league_name
         self.player_name = player_name
@@ -165,46 +236,83 @@ class BaseRankCalculator(metaclass=ABCMeta):
     """
     Ranks on result queryset with given expressions from RankCategory classes.
     After you inherit this class, you must add RankCategory classes to it.
-    """
-    """
-    TODO
-    현재 매우 느림. 이유를 파악하자.
-    그리고 클래스가 많고 구조가 많이 복잡하다.
-    동작은 하지만 개선이 필요하다.
+
+    All categories are annotated on one grouped queryset,
+    and each category gets its own row number partitioned by league name.
+    So database returns only top N rows of each category in a single query.
     """
 
-    def __init__(self, queryset):
+    def __init__(self, queryset, limit=5):
         self.queryset = queryset
-        self.limit = 5
+        self.limit = limit
         self.rank_category_list = []
 
-    def ranks(self):
-        self.group_queryset_by_league_name_and_player_name()
-        self.annotate_on_queryset_with_rank_category_list()
-
-    def group_queryset_by_league_name_and_player_name(self):
-        self.queryset = self.queryset.values(
-            'league__name', 'player__name'
-        ).order_by(
-            'league__name', 'player__name'
-        )
-
-    def annotate_on_queryset_with_rank_category_list(self):
-        for rank_category in self.rank_category_list:
-            self.queryset = rank_category.get_annotated_queryset(self.queryset)
-
     def set_rank_category_list(self, *rank_category_list_args):
         self.rank_category_list = list(rank_category_list_args)
 
-    def get_ranked_queryset(self):
-        return self.queryset
-
     def get_rank_category_name_list(self):
         name_list = []
         for rank_category in self.rank_category_list:
             name_list.append(rank_category.get_name())
         return name_list
 
+    def get_ranked_queryset(self):
+        queryset = self.group_queryset_by_league_name_and_player_name()
+        queryset = self.annotate_on_queryset_with_rank_category_list(queryset)
+        return self.annotate_row_number_on_queryset(queryset)
+
+    def group_queryset_by_league_name_and_player_name(self):
+        # Use aliases instead of 'league__name' and 'player__name',
+        # because both columns are called 'name' in wrapping query.
+        return self.queryset.annotate(
+            league_name=F('league__name'),
+            player_name=F('player__name'),
+        ).values(
+            'league_name', 'player_name'
+        ).order_by()
+
+    def annotate_on_queryset_with_rank_category_list(self, queryset):
+        for rank_category in self.rank_category_list:
+            queryset = rank_category.get_annotated_queryset(queryset)
+        return queryset
+
+    def annotate_row_number_on_queryset(self, queryset):
+        for rank_category in self.rank_category_list:
+            queryset = queryset.annotate(**{
+                rank_category.get_row_number_name(): Window(
+                    expression=RowNumber(),
+                    partition_by=[F('league_name')],
+                    order_by=[
+                        F(rank_category.get_name()).desc(),
+                        F('player_name').asc(),
+                    ]
+                )
+            })
+        return queryset
+
+    def get_top_rows(self):
+        """
+        Django can't filter queryset on window expressions.
+        So wrap ranked queryset with subquery, and filter row numbers on it.
+        """
+        queryset = self.get_ranked_queryset()
+        sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+
+        row_number_condition = ' OR '.join(
+            f'ranked.{rank_category.get_row_number_name()} <= %s'
+            for rank_category in self.rank_category_list
+        )
+        params = tuple(params) + (self.limit,) * len(self.rank_category_list)
+
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                f'SELECT * FROM ({sql}) AS ranked '
+                f'WHERE {row_number_condition}',
+                params
+            )
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
 
 class MeleeRankCalculator(BaseRankCalculator):
     def __init__(self, melee_result_queryset):
@@ -215,7 +323,6 @@ class MeleeRankCalculator(BaseRankCalculator):
             ResultCountRankCategory(),
             WinPercentageRankCategory(),
         )
-        super().ranks()
 
 
 class LeagueMeleeRank(MeleeRankCalculator):
@@ -224,26 +331,33 @@ class LeagueMeleeRank(MeleeRankCalculator):
         self.__league_rank_data_dict = LeagueRankDataDict()
 
     def ranks(self):
+        top_rows = self.get_top_rows()
+
         for rank_category in self.rank_category_list:
             self.category_name = rank_category.get_name()
-            self.order_queryset_by_category()
-            self.convert_ordered_queryset_to_RankData()
+            self.row_number_name = rank_category.get_row_number_name()
+            self.convert_top_rows_to_RankData(top_rows)
             self.classify_rank_data_list()
 
         return self.__league_rank_data_dict
 
-    def order_queryset_by_category(self):
-        self.ordered_queryset = self.get_ranked_queryset().order_by(
-            'league__name', F(self.category_name).desc(), 'player__name'
+    def convert_top_rows_to_RankData(self, top_rows):
+        category_rows = [
+            row for row in top_rows
+            if row.get(self.row_number_name) <= self.limit
+        ]
+        category_rows.sort(
+            key=lambda row: (
+                row.get('league_name'), row.get(self.row_number_name)
+            )
         )
 
-    def convert_ordered_queryset_to_RankData(self):
         self.converted_rank_data_list = RankDataList()
-        for row in self.ordered_queryset:
+        for row in category_rows:
             self.converted_rank_data_list.add_data(
                 RankData(
-                    row.get('league__name'),
-                    row.get('player__name'),
+                    row.get('league_name'),
+                    row.get('player_name'),
                     self.category_name,
                     row.get(self.category_name),
                 )
@@ -265,6 +379,9 @@ class BaseRankCategory(metaclass=ABCMeta):
     def get_name(self):
         return self.name
 
+    def get_row_number_name(self):
+        return f'{self.name}_row_number'
+
 
 class WinCountRankCategory(BaseRankCategory):
     def __init__(self):
@@ -310,3 +427,59 @@ class WinPercentageRankCategory(BaseRankCategory):
                 Cast('is_win', output_field=IntegerField()) * 100
             )
         )
+
+
+class LeagueStatistics:
+    """
+    Calculate first page of matches, race statistics and ranks of leagues.
+    All states are kept in object, so create new object for each request.
+    Then it is safe to run in parallel threads.
+
+    Race statistics, ranks, and match page of each league
+    don't depend on each other, so they are run concurrently.
+    """
+
+    def __init__(self, league_list, result_queryset, race_matchup_queryset):
+        self.league_list = league_list
+        self.result_queryset = result_queryset
+        self.race_matchup_queryset = race_matchup_queryset
+
+    def get_tasks(self):
+        """
+        Return dict of section key and function what calculates it.
+        """
+        task_dict = {
+            'race_statistics': LeagueRaceStatisticsCalculator(
+                self.race_matchup_queryset
+            ).calculate,
+            # Row numbers are partitioned by league,
+            # so all leagues are ranked in one query.
+            'rank': LeagueMeleeRank(
+                self.result_queryset.filter(type='melee')
+            ).ranks,
+        }
+        for league in self.league_list:
+            task_dict[('match_page', league.name)] = league.get_match_page
+        return task_dict
+
+    def combine(self, section_dict):
+        race_statistics_dict = section_dict['race_statistics']
+        rank_data_dict = section_dict['rank']
+
+        league_statistics = {}
+
+        for league in self.league_list:
+            race_statistics = race_statistics_dict.get_or_create(league.name)
+            match_page = section_dict[('match_page', league.name)]
+            rank_data = rank_data_dict.get_or_create(league.name)
+
+            league_statistics[league.name] = {
+                'race_statistics': race_statistics,
+                'matches': match_page['match_list'],
+                'next_page_url': match_page['next_page_url'],
+                'rank': rank_data,
+            }
+        return league_statistics
+
+    def calculate(self):
+        return self.combine(run_concurrently(self.get_tasks()))
@@ -0,0 +1,190 @@
+import random
+from datetime import date
+from datetime import timedelta
+
+from haley_gg.apps.stats.models import Player
+from haley_gg.apps.stats.models import League
+from haley_gg.apps.stats.models import Map
+from haley_gg.apps.stats.models import Match
+from haley_gg.apps.stats.models import Game
+from haley_gg.apps.stats.models import Result
+
+
+"""
+Synthetic data to measure statistics on large tables.
+Each game is saved as one game and two results,
+same as PVPDataFormSet.save_with.
+"""
+
+RACE_LIST = ['T', 'P', 'Z']
+
+# Each teamplay round has this number of games, one game for each pair.
+TEAMPLAY_PLAYER_COUNT = 3
+
+CHUNK_SIZE = 5000
+
+
+class SyntheticDataGenerator:
+    """
+    Players have hidden skill, so stronger players win more.
+    Players mostly play their most race.
+    Games are spread on dates over given years,
+    and grouped into rounds of match by league and date.
+    """
+
+    def __init__(
+        self,
+        player_count=50,
+        league_count=4,
+        map_count=8,
+        years=1,
+        teamplay_ratio=0.1,
+        name_prefix='synthetic',
+        seed=0,
+    ):
+        self.player_count = player_count
+        self.league_count = league_count
+        self.map_count = map_count
+        self.years = years
+        self.teamplay_ratio = teamplay_ratio
+        self.name_prefix = name_prefix
+        self.rng = random.Random(seed)
+
+    def create(self, game_count):
+        self.create_players()
+        self.create_leagues()
+        self.create_maps()
+        self.create_results(game_count)
+        return {
+            'players': self.player_list,
+            'leagues': self.league_list,
+            'maps': self.melee_map_list + self.teamplay_map_list,
+        }
+
+    def create_players(self):
+        self.player_list = Player.objects.bulk_create([
+            Player(
+                name=f'{self.name_prefix}{index}',
+                most_race=self.rng.choice(RACE_LIST),
+            )
+            for index in range(self.player_count)
+        ])
+        self.skill_dict = {
+            player.id: self.rng.gauss(0, 1) for player in self.player_list
+        }
+
+    def create_leagues(self):
+        self.league_list = League.objects.bulk_create([
+            League(
+                name=f'{self.name_prefix}-league{index}',
+                type='proleague' if index % 2 == 0 else 'starleague',
+            )
+            for index in range(self.league_count)
+        ])
+
+    def create_maps(self):
+        self.melee_map_list = Map.objects.bulk_create([
+            Map(name=f'{self.name_prefix}-map{index}', type='melee')
+            for index in range(self.map_count)
+        ])
+        self.teamplay_map_list = Map.objects.bulk_create([
+            Map(name=f'{self.name_prefix}-teamplay-map', type='teamplay')
+        ])
+
+    def create_results(self, game_count):
+        day_count = max(self.years * 365, 1)
+        # Round up, so last date of games is not after today.
+        games_per_day = max(-(-game_count // day_count), 1)
+        start_date = date.today() - timedelta(days=day_count)
+
+        game_list = []
+        game_index = 0
+        while game_index < game_count:
+            day = game_index // games_per_day
+            round_number = game_index % games_per_day + 1
+            match_kwargs = {
+                'date': start_date + timedelta(days=day),
+                'league': self.league_list[day % self.league_count],
+                'title': f'{day}주차',
+                'round': f'{round_number}세트',
+            }
+
+            if self.rng.random() < self.teamplay_ratio:
+                game_list.extend(self.get_teamplay_games(match_kwargs))
+                game_index += TEAMPLAY_PLAYER_COUNT
+            else:
+                game_list.append(self.get_melee_game(match_kwargs))
+                game_index += 1
+
+            if len(game_list) >= CHUNK_SIZE:
+                self.save_games(game_list)
+                game_list = []
+        self.save_games(game_list)
+
+    def save_games(self, game_list):
+        Match.set_matches(game_list)
+        Game.objects.bulk_create(game_list)
+        result_list = []
+        for game in game_list:
+            result_list.extend(game.get_results())
+        Result.objects.bulk_create(result_list)
+
+    def get_race(self, player):
+        if self.rng.random() < 0.8:
+            return player.most_race
+        return self.rng.choice(RACE_LIST)
+
+    def is_first_player_won(self, first_skill, second_skill):
+        win_probability = 1 / (1 + 10 ** (second_skill - first_skill))
+        return self.rng.random() < win_probability
+
+    def get_game(self, winner, loser, **kwargs):
+        return Game(
+            winner=winner,
+            loser=loser,
+            winner_race=self.get_race(winner),
+            loser_race=self.get_race(loser),
+            **kwargs
+        )
+
+    def get_melee_game(self, match_kwargs):
+        winner, loser = self.rng.sample(self.player_list, 2)
+        if not self.is_first_player_won(
+            self.skill_dict[winner.id], self.skill_dict[loser.id]
+        ):
+            winner, loser = loser, winner
+        return self.get_game(
+            winner,
+            loser,
+            map=self.rng.choice(self.melee_map_list),
+            type='melee',
+            **match_kwargs
+        )
+
+    def get_teamplay_games(self, match_kwargs):
+        player_list = self.rng.sample(
+            self.player_list, TEAMPLAY_PLAYER_COUNT * 2
+        )
+        winner_list = player_list[:TEAMPLAY_PLAYER_COUNT]
+        loser_list = player_list[TEAMPLAY_PLAYER_COUNT:]
+        if not self.is_first_player_won(
+            sum(self.skill_dict[player.id] for player in winner_list),
+            sum(self.skill_dict[player.id] for player in loser_list),
+        ):
+            winner_list, loser_list = loser_list, winner_list
+
+        return [
+            self.get_game(
+                winner,
+                loser,
+                map=self.teamplay_map_list[0],
+                type='teamplay',
+                **match_kwargs
+            )
+            for winner, loser in zip(winner_list, loser_list)
+        ]
+
+
+def create_synthetic_data(game_count, **kwargs):
+    return SyntheticDataGenerator(**kwargs).create(game_count)
+
@@ -1,3 +1,606 @@
+from datetime import timedelta
+from fractions import Fraction
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db import router
+from django.db.models import Q
+from django.forms.models import model_to_dict
 from django.test import TestCase
+from django.test import TransactionTestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from haley_gg.apps.stats.models import Player
+from haley_gg.apps.stats.models import Map
+from haley_gg.apps.stats.models import League
+from haley_gg.apps.stats.models import Match
+from haley_gg.apps.stats.models import Game
+from haley_gg.apps.stats.models import Result
+from haley_gg.apps.stats.models import Elo
+from haley_gg.apps.stats.models import RaceMatchup
+from haley_gg.apps.stats.models import HeadToHead
+from haley_gg.apps.stats.models import PlayerStreak
+from haley_gg.apps.stats.models import ProleagueTeam
+from haley_gg.apps.stats.models import rebuild_derived_data
+from haley_gg.apps.stats.forms import ResultForm
+from haley_gg.apps.stats.forms import get_pvp_data_formset
+from haley_gg.apps.stats.search import player_name_index
+from haley_gg.apps.stats.routers import statistics_reads
+from haley_gg.apps.stats.routers import primary_reads
+from haley_gg.apps.stats.utils import run_concurrently
+from haley_gg.apps.stats.utils import shutdown_executor
+from haley_gg.apps.stats.statistics import LeagueStatistics
+from haley_gg.apps.stats.synthetic import SyntheticDataGenerator
 
 # Create your tests here.
+
+
+class PlayerDetailViewTest(TestCase):
+    # One query reads marker of recent writes from database cache.
+    PLAYER_PAGE_QUERY_COUNT = 5
+
+    def get_query_count(self, player):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(player.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_results(self):
+        generator = SyntheticDataGenerator(
+            player_count=6,
+            league_count=2,
+            map_count=2,
+        )
+        player = generator.create(10)['players'][0]
+        rebuild_derived_data()
+        # Players are saved without signals, and index is loaded once.
+        player_name_index.invalidate()
+        player_name_index.get_entries()
+        query_count = self.get_query_count(player)
+
+        generator.create_results(200)
+        rebuild_derived_data()
+
+        self.assertEqual(self.get_query_count(player), query_count)
+        self.assertEqual(query_count, self.PLAYER_PAGE_QUERY_COUNT)
+
+
+class PlayerNameIndexTest(TestCase):
+    def setUp(self):
+        for name in ['헤일리', '헬로우', 'Haley', 'Flash', '이영호']:
+            Player.objects.create(name=name)
+        # Index is invalidated on commit, which doesn't happen in test.
+        player_name_index.invalidate()
+
+    def test_get_name(self):
+        self.assertEqual(player_name_index.get_name('HAL EY'), 'Haley')
+        self.assertIsNone(player_name_index.get_name('Hal'))
+
+    def test_get_name_prefers_same_saved_name(self):
+        Player.objects.create(name='haley')
+        player_name_index.invalidate()
+        self.assertEqual(player_name_index.get_name('Haley'), 'Haley')
+        self.assertEqual(player_name_index.get_name('haley'), 'haley')
+        # Normalised name of two players isn't guessed.
+        self.assertIsNone(player_name_index.get_name('HALEY'))
+
+    def test_player_added_in_other_process_is_found(self):
+        player_name_index.get_entries()
+        # Index of this process isn't invalidated.
+        Player.objects.bulk_create([Player(name='haley')])
+        response = self.client.get('/stats/player/haley/')
+        self.assertEqual(response.context['player'].name, 'haley')
+
+    def test_search(self):
+        self.assertEqual(player_name_index.search('헤'), ['헤일리', '헬로우'])
+        # Syllable being typed and initial consonants.
+        self.assertEqual(player_name_index.search('헤이'), ['헤일리'])
+        self.assertEqual(player_name_index.search('ㅇㅇㅎ'), ['이영호'])
+        self.assertEqual(player_name_index.search('영호'), ['이영호'])
+        self.assertEqual(player_name_index.search('flahs'), ['Flash'])
+
+    def test_search_form_redirects_to_matched_player(self):
+        response = self.client.get('/', {'name': 'fla sh'})
+        self.assertRedirects(response, '/stats/player/Flash/')
+
+
+class ResultExportViewTest(TestCase):
+    def test_export_filtered_games(self):
+        player = SyntheticDataGenerator(
+            player_count=6,
+            league_count=2,
+            map_count=2,
+        ).create(20)['players'][0]
+        player_name_index.invalidate()
+
+        response = self.client.get(
+            '/stats/export/results.csv', {'player': player.name}
+        )
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            lines[0], '\ufeff' + ','.join(Game.RESULT_FIELD_NAMES)
+        )
+        self.assertEqual(
+            len(lines) - 1,
+            Game.objects.filter(
+                Q(winner=player) | Q(loser=player)
+            ).count()
+        )
+
+
+class ResultGameTest(TestCase):
+    def test_results_created_one_by_one_share_game(self):
+        synthetic_data = SyntheticDataGenerator(
+            player_count=2,
+            league_count=1,
+            map_count=1,
+        ).create(0)
+        winner, loser = synthetic_data['players']
+        field_values = {
+            'league': synthetic_data['leagues'][0],
+            'map': synthetic_data['maps'][0],
+            'type': 'melee',
+            'title': '1주차',
+            'round': '1세트',
+            'winner': winner,
+            'loser': loser,
+            'winner_race': 'T',
+            'loser_race': 'Z',
+        }
+        # Results are created one by one in admin page.
+        winner_result = Result.objects.create(
+            player=winner, race='T', is_win=True, **field_values
+        )
+        loser_result = Result.objects.create(
+            player=loser, race='Z', is_win=False, **field_values
+        )
+
+        game = Game.objects.get()
+        self.assertIsNotNone(game.match)
+        self.assertEqual(winner_result.game, game)
+        self.assertEqual(loser_result.game, game)
+        self.assertEqual(game.results.count(), 2)
+        match_page = field_values['league'].get_match_page()
+        self.assertEqual(len(match_page['match_list']), 1)
+
+    def test_edited_result_updates_mirror_result(self):
+        synthetic_data = SyntheticDataGenerator(
+            player_count=3,
+            league_count=1,
+            map_count=2,
+        ).create(0)
+        winner, loser, other_player = synthetic_data['players']
+        game = Game(
+            date=timezone.now().date(),
+            league=synthetic_data['leagues'][0],
+            map=synthetic_data['maps'][0],
+            type='melee',
+            title='1주차',
+            round='1세트',
+            winner=winner,
+            loser=loser,
+            winner_race='T',
+            loser_race='Z',
+        )
+        Match.set_matches([game])
+        game.save()
+        winner_result, loser_result = Result.objects.bulk_create(
+            game.get_results()
+        )
+
+        # Loser and map are edited on winner's result in admin page.
+        winner_result.loser = other_player
+        winner_result.loser_race = 'P'
+        winner_result.map = synthetic_data['maps'][1]
+        winner_result.save()
+
+        loser_result.refresh_from_db()
+        self.assertEqual(loser_result.player, other_player)
+        self.assertEqual(loser_result.race, 'P')
+        self.assertEqual(loser_result.loser, other_player)
+        self.assertEqual(loser_result.map, synthetic_data['maps'][1])
+        game.refresh_from_db()
+        self.assertEqual(game.loser, other_player)
+        self.assertEqual(game.map, synthetic_data['maps'][1])
+
+
+def save_results(test_case, league, map, player_pair_list):
+    """
+    Save melee results of winner and loser pairs with result form,
+    each pair in its own round. Results are later than synthetic results.
+    """
+    result_form = ResultForm({
+        'date': timezone.now().date() + timedelta(days=1),
+        'league': league.id,
+        'title': '결승',
+    })
+    data = {
+        'form-TOTAL_FORMS': len(player_pair_list),
+        'form-INITIAL_FORMS': 0,
+    }
+    for index, (winner, loser) in enumerate(player_pair_list):
+        data.update({
+            f'form-{index}-round': f'{index + 1}세트',
+            f'form-{index}-type': 'melee',
+            f'form-{index}-map': map.id,
+            f'form-{index}-winner': winner.id,
+            f'form-{index}-winner_race': 'T',
+            f'form-{index}-loser': loser.id,
+            f'form-{index}-loser_race': 'Z',
+        })
+    formset = get_pvp_data_formset()(data)
+    test_case.assertTrue(result_form.is_valid())
+    test_case.assertTrue(formset.is_valid_with(result_form))
+    formset.save_with(result_form)
+
+
+def get_elo_dict():
+    return {
+        elo.result_id: (elo.value, elo.streak)
+        for elo in Elo.objects.all()
+    }
+
+
+class EloTest(TransactionTestCase):
+    def setUp(self):
+        synthetic_data = SyntheticDataGenerator(
+            player_count=6,
+            league_count=1,
+            map_count=2,
+        ).create(30)
+        rebuild_derived_data()
+        self.player_list = synthetic_data['players']
+        self.league = synthetic_data['leagues'][0]
+        self.map = synthetic_data['maps'][0]
+
+    def test_update_with_is_same_as_replay_all(self):
+        save_results(self, self.league, self.map, [
+            (self.player_list[0], self.player_list[1]),
+            (self.player_list[0], self.player_list[2]),
+        ])
+        elo_dict = get_elo_dict()
+        self.assertEqual(
+            len(elo_dict),
+            Result.objects.filter(type='melee').count()
+        )
+
+        Elo.replay_all()
+        self.assertEqual(get_elo_dict(), elo_dict)
+
+    def test_changed_result_replays_elo(self):
+        # Result is changed one by one, such as in admin page.
+        result = Result.objects.filter(type='melee').earliest('date')
+        result.delete()
+
+        elo_dict = get_elo_dict()
+        self.assertNotIn(result.id, elo_dict)
+        Elo.replay_all()
+        self.assertEqual(get_elo_dict(), elo_dict)
+
+
+def get_count_dict(model):
+    # Rows uncounted to zero are kept, but aren't created by rebuild.
+    # last_played isn't moved back when games are uncounted.
+    key_field_names = [
+        model._meta.get_field(name).name for name in model.KEY_FIELD_NAMES
+    ]
+    count_dict = {}
+    for row in model.objects.all():
+        counts = model_to_dict(
+            row, exclude=['id', 'last_played', *key_field_names]
+        )
+        if any(counts.values()):
+            count_dict[tuple(
+                getattr(row, name) for name in model.KEY_FIELD_NAMES
+            )] = counts
+    return count_dict
+
+
+def get_streak_dict():
+    return {
+        streak.player_id: model_to_dict(streak, exclude=['id'])
+        for streak in PlayerStreak.objects.all()
+    }
+
+
+class MeleeResultCounterTest(TestCase):
+    def test_count_results_is_same_as_rebuild(self):
+        SyntheticDataGenerator(
+            player_count=6,
+            league_count=2,
+            map_count=2,
+        ).create(40)
+        result_list = list(Result.objects.all())
+        half = len(result_list) // 2
+
+        for model in [RaceMatchup, HeadToHead]:
+            # Rows of first half exist when second half is counted.
+            model.count_results(result_list[:half])
+            model.count_results(result_list[half:])
+            count_dict = get_count_dict(model)
+
+            model.rebuild()
+            self.assertEqual(count_dict, get_count_dict(model))
+
+
+class DerivedDataTest(TransactionTestCase):
+    """
+    Tables updated incrementally are same as tables rebuilt from results.
+    """
+
+    def setUp(self):
+        synthetic_data = SyntheticDataGenerator(
+            player_count=6,
+            league_count=1,
+            map_count=2,
+        ).create(30)
+        self.player_list = synthetic_data['players']
+        self.league = synthetic_data['leagues'][0]
+        self.map = synthetic_data['maps'][0]
+        for index, player_list in enumerate([
+            self.player_list[:3], self.player_list[3:]
+        ]):
+            team = ProleagueTeam.objects.create(
+                name=f'team{index}', league=self.league
+            )
+            team.players.set(player_list)
+        rebuild_derived_data()
+        ProleagueTeam.rebuild()
+
+    def assertSameAsRebuild(self):
+        streak_dict = get_streak_dict()
+        PlayerStreak.rebuild()
+        self.assertEqual(get_streak_dict(), streak_dict)
+        for model in [RaceMatchup, HeadToHead]:
+            count_dict = get_count_dict(model)
+            model.rebuild()
+            self.assertEqual(get_count_dict(model), count_dict)
+        self.assertEqual(ProleagueTeam.rebuild(commit=False), [])
+
+    def test_save_with_is_same_as_rebuild(self):
+        team_points = ProleagueTeam.objects.get(name='team0').points
+        save_results(self, self.league, self.map, [
+            (self.player_list[0], self.player_list[3]),
+            (self.player_list[1], self.player_list[4]),
+        ])
+        self.assertEqual(
+            ProleagueTeam.objects.get(name='team0').points,
+            team_points + 2
+        )
+        self.assertSameAsRebuild()
+
+    def test_deleted_result_is_same_as_rebuild(self):
+        # Result is deleted one by one, such as in admin page.
+        Result.objects.filter(type='melee').earliest('date').delete()
+        self.assertSameAsRebuild()
+
+    def test_edited_result_is_same_as_rebuild(self):
+        # Races and winner are edited on loser's result in admin page.
+        result = Result.objects.filter(
+            type='melee', is_win=False
+        ).earliest('date')
+        result.winner = next(
+            player for player in self.player_list
+            if player.id not in (result.winner_id, result.loser_id)
+        )
+        result.winner_race = 'P' if result.winner_race != 'P' else 'T'
+        result.loser_race = result.race = 'Z'
+        result.save()
+        self.assertEqual(
+            Result.objects.get(game=result.game, is_win=True).player,
+            result.winner
+        )
+        self.assertSameAsRebuild()
+
+
+class LeagueRankTest(TestCase):
+    def get_python_rank_dict(self, limit):
+        """
+        Rank players of each league in Python,
+        in same order as ranks were sorted before window query.
+        """
+        counts_dict = {}
+        for result in Result.objects.filter(type='melee').select_related(
+            'league', 'player'
+        ):
+            counts = counts_dict.setdefault(
+                (result.league.name, result.player.name), [0, 0]
+            )
+            counts[0 if result.is_win else 1] += 1
+
+        category_values_dict = {}
+        for (league_name, player_name), (win, lose) in counts_dict.items():
+            for category, value in [
+                ('win_count', win),
+                ('lose_count', lose),
+                ('result_count', win + lose),
+                ('win_percentage', Fraction(win * 100, win + lose)),
+            ]:
+                category_values_dict.setdefault(
+                    (league_name, category), []
+                ).append((-value, player_name))
+
+        rank_dict = {}
+        for (league_name, category), values in category_values_dict.items():
+            rank_dict.setdefault(league_name, {})[category] = [
+                (player_name, round(float(-value), 6))
+                for value, player_name in sorted(values)[:limit]
+            ]
+        return rank_dict
+
+    def test_ranks_are_same_as_python_ranks(self):
+        league_list = SyntheticDataGenerator(
+            player_count=12,
+            league_count=3,
+            map_count=2,
+        ).create(150)['leagues']
+        task_dict = LeagueStatistics(
+            league_list, Result.objects.all(), RaceMatchup.objects.all()
+        ).get_tasks()
+
+        # All leagues are ranked in one query.
+        with CaptureQueriesContext(connection) as queries:
+            league_rank_data_dict = task_dict['rank']()
+        self.assertEqual(len(queries), 1)
+
+        rank_dict = {
+            league_name: {
+                category: [
+                    (rank_data.player_name, round(float(rank_data.value), 6))
+                    for rank_data in rank_data_list
+                ]
+                for category, rank_data_list in rank_data_dict.items()
+            }
+            for league_name, rank_data_dict in league_rank_data_dict.items()
+        }
+        self.assertEqual(len(rank_dict), 3)
+        self.assertEqual(
+            rank_dict, self.get_python_rank_dict(limit=5)
+        )
+
+
+class LeagueStatisticsCacheTest(TestCase):
+    def test_statistics_calculated_before_change_are_not_read(self):
+        league = SyntheticDataGenerator(
+            player_count=6,
+            league_count=1,
+            map_count=2,
+        ).create(20)['leagues'][0]
+        rebuild_derived_data()
+        League.get_proleague_statistics()
+
+        # Request started before results are changed
+        # saves its statistics after cache is deleted.
+        cache_key_dict = League.get_statistics_cache_key_dict([league])
+        League.delete_statistics_cache([league.id])
+        cache.set_many(
+            {cache_key: 'previous' for cache_key in cache_key_dict}
+        )
+
+        statistics = League.get_proleague_statistics()[league.name]
+        self.assertNotEqual(statistics, 'previous')
+        self.assertIn('rank', statistics)
+
+
+@override_settings(STATISTICS_THREAD_COUNT=2)
+class RunConcurrentlyTest(TransactionTestCase):
+    def tearDown(self):
+        # Workers keep connections, which block dropping test database.
+        shutdown_executor()
+
+    def test_workers_keep_connections(self):
+        def get_connection_id():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_backend_pid()')
+                return cursor.fetchone()[0]
+
+        def count_players():
+            # Worker runs nested functions in order, without deadlock.
+            return run_concurrently({
+                'count': Player.objects.count,
+                'connection_id': get_connection_id,
+            })
+
+        task_dict = {index: count_players for index in range(4)}
+        first_result_dict = run_concurrently(task_dict)
+        second_result_dict = run_concurrently(task_dict)
+
+        self.assertEqual(
+            {result['count'] for result in first_result_dict.values()},
+            {0}
+        )
+        connection_id_set = {
+            result['connection_id']
+            for result_dict in [first_result_dict, second_result_dict]
+            for result in result_dict.values()
+        }
+        self.assertLessEqual(len(connection_id_set), 2)
+
+
+class StatisticsAPIViewTest(TransactionTestCase):
+    # Versions of statistics are changed after commit.
+
+    def test_not_modified_until_results_change(self):
+        player = SyntheticDataGenerator(
+            player_count=6,
+            league_count=2,
+            map_count=2,
+        ).create(20)['players'][0]
+        rebuild_derived_data()
+        url = f'/stats/api/player/{player.name}/'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], player.name)
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        player.results.first().delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_result_edit_changes_etag(self):
+        player = SyntheticDataGenerator(
+            player_count=6,
+            league_count=2,
+            map_count=2,
+        ).create(20)['players'][0]
+        rebuild_derived_data()
+        url = f'/stats/api/player/{player.name}/'
+        etag = self.client.get(url)['ETag']
+
+        # Id, date and count of results are not changed.
+        result = player.results.first()
+        result.race = 'P' if result.race != 'P' else 'T'
+        result.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        player.tier = 'major' if player.tier != 'major' else 'minor'
+        player.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['tier'], player.tier)
+
+    def test_map_change_changes_etag(self):
+        SyntheticDataGenerator(
+            player_count=6,
+            league_count=1,
+            map_count=2,
+        ).create(20)
+        rebuild_derived_data()
+        url = '/stats/api/map/'
+        etag = self.client.get(url)['ETag']
+
+        Map.objects.create(name='새 맵', type='melee')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('새 맵', response.json())
+
+
+@skipUnless(
+    'replica' in settings.DATABASES, 'Replica database is not configured.'
+)
+class StatisticsRouterTest(TransactionTestCase):
+    # Replica mirrors default database in tests.
+    # TransactionTestCase is used, because reads in transaction
+    # are routed to default database.
+    databases = '__all__'
+
+    def test_statistics_reads_are_routed_to_replica(self):
+        self.assertEqual(router.db_for_read(Game), 'default')
+        with statistics_reads():
+            self.assertEqual(router.db_for_read(Game), 'replica')
+            with primary_reads():
+                self.assertEqual(router.db_for_read(Game), 'default')
+        self.assertEqual(router.db_for_write(Game), 'default')
+        self.assertTrue(router.allow_migrate('default', 'stats'))
+        self.assertFalse(router.allow_migrate('replica', 'stats'))
@@ -0,0 +1,344 @@
+import csv
+import json
+from datetime import datetime
+
+from django.db import transaction
+
+from haley_gg.apps.stats.models import Player
+from haley_gg.apps.stats.models import League
+from haley_gg.apps.stats.models import Map
+from haley_gg.apps.stats.models import Match
+from haley_gg.apps.stats.models import Game
+from haley_gg.apps.stats.models import Result
+from haley_gg.apps.stats.models import ProleagueTeam
+from haley_gg.apps.stats.models import rebuild_derived_data
+from haley_gg.apps.stats.search import normalize_name
+
+
+"""
+Results are moved as rows of games, one row for each game.
+Columns are Game.RESULT_FIELD_NAMES,
+and names of player, league and map are written instead of id.
+Teamplay round has one row for each pair of players.
+Exported files can be imported again.
+"""
+
+FIELD_NAMES = Game.RESULT_FIELD_NAMES
+
+# Lookups of values written in each column.
+EXPORT_LOOKUP_DICT = {
+    'league': 'league__name',
+    'map': 'map__name',
+    'winner': 'winner__name',
+    'loser': 'loser__name',
+}
+
+# Rows fetched at once from server-side cursor.
+EXPORT_CHUNK_SIZE = 2000
+
+# Labels of ResultForm and PVPDataForm, used as header of spreadsheet.
+HEADER_ALIAS_DICT = {
+    '날짜': 'date',
+    '리그': 'league',
+    '게임 이름': 'title',
+    '라운드': 'round',
+    '맵': 'map',
+    '게임 타입': 'type',
+    '승자': 'winner',
+    '패자': 'loser',
+    '승자 종족': 'winner_race',
+    '패자 종족': 'loser_race',
+    '특이사항': 'remarks',
+    'remark': 'remarks',
+}
+
+TYPE_ALIAS_DICT = {
+    'melee': 'melee',
+    'teamplay': 'teamplay',
+    '밀리': 'melee',
+    '팀플': 'teamplay',
+}
+
+RACE_LIST = ['T', 'P', 'Z']
+
+# Spreadsheets write dates in several formats.
+DATE_FORMAT_LIST = [
+    '%Y-%m-%d',
+    '%Y.%m.%d',
+    '%Y. %m. %d',
+    '%Y. %m. %d.',
+    '%Y/%m/%d',
+]
+
+
+def parse_date(value):
+    value = value.strip()
+    for date_format in DATE_FORMAT_LIST:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f'날짜 형식이 아닙니다: {value}')
+
+
+def get_field_name(header):
+    header = header.strip()
+    return HEADER_ALIAS_DICT.get(header, header.lower())
+
+
+def get_row(record):
+    return {
+        get_field_name(key): '' if value is None else str(value)
+        for key, value in record.items()
+    }
+
+
+def read_csv_rows(file):
+    """
+    Yield line number and dict of each row, reading file lazily.
+    """
+    reader = csv.reader(file)
+    field_name_list = [get_field_name(header) for header in next(reader)]
+    for row in reader:
+        if any(row):
+            yield reader.line_num, dict(zip(field_name_list, row))
+
+
+def read_json_rows(file):
+    """
+    Yield row number and dict of each row of worksheet saved as JSON.
+    Both get_all_values (list of lists with header)
+    and get_all_records (list of dicts) of gspread are read.
+    """
+    rows = json.load(file)
+    if rows and isinstance(rows[0], list):
+        field_name_list = [get_field_name(header) for header in rows[0]]
+        rows = (dict(zip(field_name_list, row)) for row in rows[1:])
+    # Row number is same as spreadsheet, which has header in first row.
+    for row_number, record in enumerate(rows, start=2):
+        row = get_row(record)
+        if any(row.values()):
+            yield row_number, row
+
+
+def read_jsonl_rows(file):
+    """
+    Yield line number and dict of each line, such as exported results.
+    """
+    for line_number, line in enumerate(file, start=1):
+        if line.strip():
+            yield line_number, get_row(json.loads(line))
+
+
+class ResultImporter:
+    """
+    Save games and their results from rows with chunked bulk_create.
+    Names are resolved from dicts loaded once, so saving a chunk
+    only queries matches, games and results.
+
+    Rounds already saved before import are skipped.
+    Derived tables are rebuilt once after all chunks,
+    because historical rows are not in order of date.
+    """
+
+    def __init__(self, chunk_size=5000, create_missing=False):
+        self.chunk_size = chunk_size
+        self.create_missing = create_missing
+
+        self.player_id_dict = {
+            normalize_name(name): player_id
+            for player_id, name in Player.objects.values_list('id', 'name')
+        }
+        self.map_id_dict = {
+            normalize_name(name): map_id
+            for map_id, name in Map.objects.values_list('id', 'name')
+        }
+        self.league_id_dict = {
+            normalize_name(name): league_id
+            for league_id, name in League.objects.values_list('id', 'name')
+        }
+
+        # Match keys saved in this import,
+        # so round split into two chunks is not skipped.
+        self.imported_match_key_set = set()
+        self.imported_league_id_set = set()
+        self.game_count = 0
+        self.skipped_game_count = 0
+
+    def import_rows(self, rows):
+        """
+        Save rows of (row number, dict) in chunks.
+        Rows of same round are kept in one chunk when they are adjacent.
+        """
+        game_list = []
+        last_match_key = None
+        for row_number, row in rows:
+            try:
+                game = self.get_game(row)
+            except ValueError as error:
+                raise ValueError(f'{row_number}번째 줄: {error}')
+
+            match_key = Match.get_match_key(game)
+            if len(game_list) >= self.chunk_size and (
+                match_key != last_match_key
+            ):
+                self.save_games(game_list)
+                game_list = []
+            game_list.append(game)
+            last_match_key = match_key
+        self.save_games(game_list)
+
+    def get_game(self, row):
+        league_id = self.league_id_dict.get(normalize_name(row.get('league')))
+        if league_id is None:
+            raise ValueError(f'리그가 없습니다: {row.get("league")}')
+
+        type = TYPE_ALIAS_DICT.get(row.get('type', '').strip().lower())
+        if type is None:
+            raise ValueError(f'게임 타입이 아닙니다: {row.get("type")}')
+
+        winner_id = self.get_player_id(row.get('winner'))
+        loser_id = self.get_player_id(row.get('loser'))
+        if winner_id == loser_id:
+            raise ValueError('승자와 패자가 같습니다.')
+
+        return Game(
+            date=parse_date(row.get('date', '')),
+            league_id=league_id,
+            title=row.get('title', '').strip(),
+            round=row.get('round', '').strip(),
+            map_id=self.get_map_id(row.get('map'), type),
+            type=type,
+            winner_id=winner_id,
+            loser_id=loser_id,
+            winner_race=self.get_race(row.get('winner_race')),
+            loser_race=self.get_race(row.get('loser_race')),
+            remarks=row.get('remarks', '').strip(),
+        )
+
+    def get_player_id(self, name):
+        key = normalize_name(name)
+        if not key:
+            raise ValueError('플레이어 이름이 없습니다.')
+        if key not in self.player_id_dict:
+            if not self.create_missing:
+                raise ValueError(f'플레이어가 없습니다: {name}')
+            # Player.save removes spaces from name.
+            self.player_id_dict[key] = Player.objects.create(name=name).id
+        return self.player_id_dict[key]
+
+    def get_map_id(self, name, type):
+        key = normalize_name(name)
+        if not key:
+            raise ValueError('맵 이름이 없습니다.')
+        if key not in self.map_id_dict:
+            if not self.create_missing:
+                raise ValueError(f'맵이 없습니다: {name}')
+            self.map_id_dict[key] = Map.objects.create(
+                name=name.strip(), type=type
+            ).id
+        return self.map_id_dict[key]
+
+    def get_race(self, race):
+        # Full names such as 'Terran' are written in spreadsheets.
+        race = (race or '').strip()[:1].upper()
+        if race not in RACE_LIST:
+            raise ValueError(f'종족이 아닙니다: {race}')
+        return race
+
+    def get_existing_match_key_set(self, game_list):
+        match_key_set = {Match.get_match_key(game) for game in game_list}
+        league_id_set, date_set, title_set, round_set = map(
+            set, zip(*match_key_set)
+        )
+        existing_match_key_set = set()
+        for match in Match.objects.filter(
+            league_id__in=league_id_set,
+            date__in=date_set,
+            title__in=title_set,
+            round__in=round_set,
+            games__isnull=False,
+        ).distinct():
+            existing_match_key_set.add(Match.get_match_key(match))
+        return existing_match_key_set & match_key_set
+
+    def save_games(self, game_list):
+        if not game_list:
+            return
+
+        with transaction.atomic():
+            skipped_match_key_set = (
+                self.get_existing_match_key_set(game_list)
+                - self.imported_match_key_set
+            )
+            new_game_list = [
+                game for game in game_list
+                if Match.get_match_key(game) not in skipped_match_key_set
+            ]
+            Match.set_matches(new_game_list)
+            Game.objects.bulk_create(new_game_list)
+
+            result_list = []
+            for game in new_game_list:
+                result_list.extend(game.get_results())
+            Result.objects.bulk_create(result_list)
+
+        for game in new_game_list:
+            self.imported_match_key_set.add(Match.get_match_key(game))
+            self.imported_league_id_set.add(game.league_id)
+        self.game_count += len(new_game_list)
+        self.skipped_game_count += len(game_list) - len(new_game_list)
+
+    @transaction.atomic
+    def rebuild_derived_data(self):
+        # Team standings are rebuilt only in imported leagues.
+        rebuild_derived_data()
+        ProleagueTeam.rebuild(list(self.imported_league_id_set))
+        self.delete_statistics_cache()
+
+    def delete_statistics_cache(self):
+        # Statistics of leagues are cached without timeout.
+        league_id_list = list(self.imported_league_id_set)
+        transaction.on_commit(
+            lambda: League.delete_statistics_cache(league_id_list)
+        )
+
+
+def get_export_rows(games, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield values of games in order of date, with server-side cursor,
+    so all games are not loaded in memory at once.
+    """
+    return games.order_by(
+        'date', 'league_id', 'title', 'round', 'id'
+    ).values_list(
+        *[
+            EXPORT_LOOKUP_DICT.get(field_name, field_name)
+            for field_name in FIELD_NAMES
+        ]
+    ).iterator(chunk_size=chunk_size)
+
+
+class Echo:
+    """
+    File-like object what returns written value,
+    so csv.writer makes lines without buffer.
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    # BOM lets spreadsheet programs read Korean names as UTF-8.
+    yield '\ufeff' + writer.writerow(FIELD_NAMES)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_jsonl(rows):
+    for row in rows:
+        yield json.dumps(
+            dict(zip(FIELD_NAMES, row)), ensure_ascii=False, default=str
+        ) + '\n'
@@ -14,5 +14,14 @@ urlpatterns = [
     path('map/', views.MapView.as_view(), name='map_list'),
     path('map/<name>/', views.MapDetailView.as_view(), name='map'),
     path('map/<name>/update/', views.MapUpdateView.as_view(), name='update_map'),
-    path('compare/', views.CompareUserView.as_view(), name='compare')
+    path('compare/', views.CompareUserView.as_view(), name='compare'),
+    path('rivalry/', views.RivalryMatrixView.as_view(), name='rivalry_matrix'),
+    path('matches/', views.MatchListView.as_view(), name='match_list'),
+    path('export/results.<format>', views.ResultExportView.as_view(), name='export_results'),
+    path('api/proleague/', views.ProleagueStatisticsAPIView.as_view(), name='api_proleague'),
+    path('api/starleague/', views.StarleagueStatisticsAPIView.as_view(), name='api_starleague'),
+    path('api/map/', views.MapStatisticsAPIView.as_view(), name='api_map_list'),
+    path('api/player/<name>/', views.PlayerStatisticsAPIView.as_view(), name='api_player'),
+    path('api/player/<name>/versus/<opponent>/', views.VersusStatisticsAPIView.as_view(), name='api_versus'),
+    path('players/autocomplete/', views.PlayerAutocompleteView.as_view(), name='player_autocomplete'),
 ]
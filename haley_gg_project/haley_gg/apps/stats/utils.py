@@ -1,79 +1,155 @@
+import json
+import atexit
+import threading
+from collections import namedtuple
 from abc import ABCMeta, abstractmethod
+from datetime import date
+from urllib.parse import urlencode
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor
 
-from django.db.models import Avg
-from django.db.models import IntegerField
-from django.db.models.functions import Cast
+from django.conf import settings
+from django.db import connections
+from django.shortcuts import reverse
+from django.utils.http import urlsafe_base64_encode
+from django.utils.http import urlsafe_base64_decode
+from django.db.models import Q
 
 
 def remove_space(text):
     return text.replace(' ', '')
 
 
-def get_player_win_rate(results):
+class LinkedName:
     """
-    Get rate from player's result queryset with is_win field.
+    Name and url of player or map in match list, instead of model object.
     """
-    win_rate = results.aggregate(
-        win_rate=Avg(
-            Cast('is_win', output_field=IntegerField()) * 100
-        )
-    )['win_rate']
-    return win_rate
+    __slots__ = ('name', 'url')
+
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+
+    def __str__(self):
+        return self.name
+
+    def get_absolute_url(self):
+        return self.url
 
 
-def get_deduplicated_result_queryset(queryset):
+class GameRow:
     """
-    Process distinct on queryset.
-    Return values are available for both melee and teamplay statistic manager.
+    Columns of game what match list templates use.
+    It is much smaller than game with related model objects.
+    Match lists are cached, so repeated values share one object.
     """
+    __slots__ = (
+        'match_id',
+        'date',
+        'league',
+        'title',
+        'round',
+        'map',
+        'winner',
+        'loser',
+        'winner_race',
+        'loser_race',
+        'remarks',
+    )
+
+    # Columns fetched from database, in order of __init__.
     field_list = [
+        'match_id',
         'date',
         'league__name',
         'title',
         'round',
+        'map__name',
+        'winner__name',
+        'loser__name',
         'winner_race',
-        'loser_race'
+        'loser_race',
+        'remarks',
     ]
-    ordering = field_list[:]
-    ordering[0] = '-date'
 
-    return queryset.order_by(*ordering).distinct(*field_list)
+    def __init__(self, values, shared_value_dict):
+        share = shared_value_dict.share
+        match_id, match_date, league, title, round, map_name, winner_name, \
+            loser_name, winner_race, loser_race, remarks = values
+        self.match_id = match_id
+        self.date = share(match_date)
+        self.league = share(league)
+        self.title = share(title)
+        self.round = share(round)
+        self.map = shared_value_dict.get_linked_name('stats:map', map_name)
+        self.winner = shared_value_dict.get_linked_name(
+            'stats:player', winner_name
+        )
+        self.loser = shared_value_dict.get_linked_name(
+            'stats:player', loser_name
+        )
+        self.winner_race = share(winner_race)
+        self.loser_race = share(loser_race)
+        self.remarks = share(remarks)
+
+
+class SharedValueDict(dict):
+    """
+    Same values in match list share one object,
+    such as league names, dates and rounds.
+    Same name shares one LinkedName,
+    so url of each name is reversed only once.
+    """
+
+    def share(self, value):
+        return self.setdefault(value, value)
+
+    def get_linked_name(self, viewname, name):
+        key = (viewname, name)
+        if key not in self:
+            self[key] = LinkedName(
+                name, reverse(viewname, kwargs={'name': name})
+            )
+        return self[key]
+
+
+PlayerWithRace = namedtuple('PlayerWithRace', ['player', 'race'])
 
 
-class Match(list):
+class MatchGames:
     """
-    같은 경기 이름을 가진 result들을 모아놓는 자료구조.
+    같은 경기 이름을 가진 game들을 모아놓는 자료구조.
+    Only games are kept, and winners and losers are made when rendering,
+    because match lists are cached for long time.
     """
-    class PlayerWithRace:
-        def __init__(self, player, race):
-            self.player = player
-            self.race = race
+    __slots__ = ('games',)
 
     def __init__(self):
-        self.winners = []
-        self.losers = []
+        self.games = []
+
+    def __iter__(self):
+        return iter(self.games)
+
+    def __len__(self):
+        return len(self.games)
 
     def add_result(self, result):
-        self.append(result)
-        self.winners.append(
-            self.PlayerWithRace(
-                result.winner, result.winner_race
-            )
-        )
-        self.losers.append(
-            self.PlayerWithRace(
-                result.loser, result.loser_race
-            )
-        )
+        self.games.append(result)
 
     def get_first_result(self):
-        return self[0]
+        return self.games[0]
 
     def get_winners(self):
-        return self.winners
+        return [
+            PlayerWithRace(game.winner, game.winner_race)
+            for game in self.games
+        ]
 
     def get_losers(self):
-        return self.losers
+        return [
+            PlayerWithRace(game.loser, game.loser_race)
+            for game in self.games
+        ]
 
 
 class BaseDataDict(dict, metaclass=ABCMeta):
@@ -94,53 +170,210 @@ class BaseDataDict(dict, metaclass=ABCMeta):
 
 class MatchDict(BaseDataDict):
     """
-    match name을 기준으로 Match들을 관리한다.
+    match id를 기준으로 MatchGames들을 관리한다.
     """
-    data_class = Match
+    data_class = MatchGames
 
     def save(self, result):
-        match = self.get_or_create(result.get_match_name())
+        match = self.get_or_create(result.match_id)
         match.add_result(result)
 
 
-class LeagueMatchDict(BaseDataDict):
+class MatchClassifier:
     """
-    league name을 기준으로 MatchDict들을 관리한다.
+    Games are fetched only with columns of GameRow,
+    not with model objects of league, map and players.
     """
 
-    data_class = MatchDict
+    def __init__(self, queryset):
+        # Game has one row for each game, so it doesn't need DISTINCT ON.
+        self.__result_queryset = queryset.order_by(
+            *MATCH_KEY_ORDERING
+        ).values_list(*GameRow.field_list)
+        self.__match_dict = MatchDict()
+
+    def classify(self):
+        shared_value_dict = SharedValueDict()
+        for values in self.__result_queryset:
+            self.__match_dict.save(GameRow(values, shared_value_dict))
+        return self.__match_dict
 
-    def save(self, result):
-        match_dict = self.get_or_create(result.league.name)
-        match_dict.save(result)
 
+"""
+Match list is paginated with keyset on match keys below,
+in same order as MatchClassifier.
+Each page fetches only keys of page, and games of those matches.
+"""
+MATCH_PAGE_SIZE = 20
 
-class LeagueMatchClassifier:
+MATCH_KEY_ORDERING = ['-date', 'league__name', 'title', 'round']
+
+
+def get_after_match_key_q(match_key):
+    """
+    Get Q object what filters matches after given match key.
+    (a, b, c) is after (x, y, z) when
+    a > x or (a = x and b > y) or (a = x and b = y and c > z).
+    """
+    q = Q()
+    for index, ordering in enumerate(MATCH_KEY_ORDERING):
+        field = ordering.lstrip('-')
+        lookup = 'lt' if ordering.startswith('-') else 'gt'
+        equal_kwargs = {
+            previous_ordering.lstrip('-'): match_key[previous_index]
+            for previous_index, previous_ordering
+            in enumerate(MATCH_KEY_ORDERING[:index])
+        }
+        q |= Q(**equal_kwargs, **{f'{field}__{lookup}': match_key[index]})
+    return q
+
+
+def paginate_matches(queryset, cursor=None, page_size=MATCH_PAGE_SIZE):
     """
-    TODO
-    Classifier의 구조가 비슷하다!
-    추상화하자.
+    Return games of matches in page, and cursor of next page.
+    If there is no next page, cursor is None.
     """
+    field_list = [ordering.lstrip('-') for ordering in MATCH_KEY_ORDERING]
+    match_key_queryset = queryset.order_by(
+        *MATCH_KEY_ORDERING
+    ).values_list(
+        'match_id', *field_list
+    ).distinct()
+    if cursor is not None:
+        match_key_queryset = match_key_queryset.filter(
+            get_after_match_key_q(cursor)
+        )
 
-    def __init__(self, queryset):
-        self.__result_queryset = get_deduplicated_result_queryset(queryset)
-        self.__league_match_dict = LeagueMatchDict()
+    match_key_list = list(match_key_queryset[:page_size + 1])
+    next_cursor = None
+    if len(match_key_list) > page_size:
+        match_key_list = match_key_list[:page_size]
+        next_cursor = match_key_list[-1][1:]
 
-    def classify(self):
-        for result in self.__result_queryset:
-            self.__league_match_dict.save(result)
-        return self.__league_match_dict
+    if not match_key_list:
+        return queryset.none(), None
 
+    return queryset.filter(
+        match_id__in=[match_key[0] for match_key in match_key_list]
+    ), next_cursor
 
-class PlayerMatchClassifier:
-    def __init__(self, queryset):
-        self.__result_queryset = get_deduplicated_result_queryset(queryset)
-        self.__match_dict = MatchDict()
 
-    def classify(self):
-        for result in self.__result_queryset:
-            self.__match_dict.save(result)
-        return self.__match_dict
+def encode_match_cursor(match_key):
+    match_date, league_name, title, round = match_key
+    return urlsafe_base64_encode(json.dumps([
+        match_date.isoformat(), league_name, title, round
+    ]).encode())
+
+
+def decode_match_cursor(cursor):
+    """
+    Return None if cursor is wrong.
+    """
+    try:
+        match_date, league_name, title, round = json.loads(
+            urlsafe_base64_decode(cursor)
+        )
+        return (date.fromisoformat(match_date), league_name, title, round)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_match_page_url(next_cursor, **params):
+    if next_cursor is None:
+        return None
+    params['cursor'] = encode_match_cursor(next_cursor)
+    return f"{reverse('stats:match_list')}?{urlencode(params)}"
+
+
+"""
+Functions are run concurrently in one pool of threads for each process.
+Connections are kept by thread, so each worker thread keeps
+its own database connections between tasks,
+and they are closed when pool is shut down at exit.
+"""
+# Seconds to wait for workers to close their connections.
+SHUTDOWN_TIMEOUT = 10
+
+worker_state = threading.local()
+executor_lock = threading.Lock()
+executor = None
+
+
+def initialize_worker():
+    worker_state.is_worker = True
+
+
+def get_executor():
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=settings.STATISTICS_THREAD_COUNT,
+                thread_name_prefix='statistics',
+                initializer=initialize_worker,
+            )
+            atexit.register(shutdown_executor)
+        return executor
+
+
+def shutdown_executor():
+    """
+    Close connections of worker threads, and stop them.
+    """
+    global executor
+    with executor_lock:
+        if executor is None:
+            return
+        thread_count = settings.STATISTICS_THREAD_COUNT
+        barrier = threading.Barrier(thread_count)
+
+        def close_connections():
+            # Each worker waits others at barrier,
+            # so every worker runs this once and closes its connections.
+            try:
+                barrier.wait(SHUTDOWN_TIMEOUT)
+            except threading.BrokenBarrierError:
+                pass
+            connections.close_all()
+
+        for _ in range(thread_count):
+            executor.submit(close_connections)
+        executor.shutdown(wait=True)
+        executor = None
+
+
+def run_in_worker(task):
+    # Connection what had error, such as after restart of database,
+    # is opened again instead of being kept.
+    for connection in connections.all():
+        if connection.errors_occurred:
+            connection.close()
+    return task()
+
+
+def run_concurrently(task_dict):
+    """
+    Run functions of dict in threads, and return dict of their results.
+    In transaction, other connections don't see uncommitted rows,
+    so functions are run in order in this thread.
+    Functions in worker thread are also run in order,
+    not to wait for workers what are waiting for this thread.
+    """
+    if (
+        settings.STATISTICS_THREAD_COUNT <= 1
+        or len(task_dict) <= 1
+        or getattr(worker_state, 'is_worker', False)
+        or any(connection.in_atomic_block for connection in connections.all())
+    ):
+        return {key: task() for key, task in task_dict.items()}
+
+    # Each thread runs in copy of context,
+    # so it reads from same database as this thread.
+    future_dict = {
+        key: get_executor().submit(copy_context().run, run_in_worker, task)
+        for key, task in task_dict.items()
+    }
+    return {key: future.result() for key, future in future_dict.items()}
 
 
 def stringify_streak_count(streak_count):
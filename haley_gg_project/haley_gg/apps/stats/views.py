@@ -1,24 +1,51 @@
+from abc import ABCMeta, abstractmethod
+
 from django.shortcuts import render
 from django.shortcuts import redirect
 from django.shortcuts import reverse
+from django.shortcuts import get_object_or_404
+from django.http import Http404
+from django.http import JsonResponse
+from django.http import StreamingHttpResponse
+from django.db import router
+from django.db.models import Q
 from django.views.generic import TemplateView
 from django.views.generic import View
 from django.views.generic import DetailView
 from django.views.generic import UpdateView
+from django.views.decorators.http import condition
+from django.views.decorators.cache import cache_control
+from django.utils.decorators import method_decorator
 
-from haley_gg.apps.stats.models import Result
 from haley_gg.apps.stats.models import Map
 from haley_gg.apps.stats.models import Player
+from haley_gg.apps.stats.models import League
+from haley_gg.apps.stats.models import Game
+from haley_gg.apps.stats.models import Result
+from haley_gg.apps.stats.models import HeadToHead
 from haley_gg.apps.stats.forms import get_pvp_data_formset
 from haley_gg.apps.stats.forms import ResultForm
 from haley_gg.apps.stats.forms import CompareUserForm
 from haley_gg.apps.stats.forms import UpdateMapForm
 from haley_gg.apps.stats.forms import UpdatePlayerForm
+from haley_gg.apps.stats.forms import ResultExportForm
 from haley_gg.apps.stats.mixins import ProleagueStatisticMixin
 from haley_gg.apps.stats.mixins import StarleagueStatisticMixin
 from haley_gg.apps.stats.mixins import MapStatisticMixin
 from haley_gg.apps.stats.mixins import PlayerSelectMixin
 from haley_gg.apps.stats.mixins import MapSelectMixin
+from haley_gg.apps.stats.mixins import StatisticsReadMixin
+from haley_gg.apps.stats.utils import remove_space
+from haley_gg.apps.stats.utils import decode_match_cursor
+from haley_gg.apps.stats.search import player_name_index
+from haley_gg.apps.stats.search import get_player
+from haley_gg.apps.stats.transfer import get_export_rows
+from haley_gg.apps.stats.transfer import stream_csv
+from haley_gg.apps.stats.transfer import stream_jsonl
+from haley_gg.apps.stats.serializers import get_etag
+from haley_gg.apps.stats.serializers import serialize_league_statistics
+from haley_gg.apps.stats.serializers import serialize_map_statistics
+from haley_gg.apps.stats.serializers import serialize_player_statistics
 
 
 class ResultCreateView(View):
@@ -49,14 +76,12 @@ class ResultCreateView(View):
         return render(request, self.template_name, context)
 
 
-class PlayerDetailView(PlayerSelectMixin, DetailView):
+class PlayerDetailView(StatisticsReadMixin, PlayerSelectMixin, DetailView):
     model = Player
     template_name = 'stats/players/detail.html'
-    queryset = Result.objects.select_related(
-        'map',
-        'league',
-        'player'
-    )
+
+    def get_queryset(self):
+        return Player.get_profile_queryset()
 
     """
     get_context_data sequence.
@@ -82,19 +107,23 @@ class PlayerUpdateView(PlayerSelectMixin, UpdateView):
     form_class = UpdatePlayerForm
 
 
-class ProleagueView(ProleagueStatisticMixin, TemplateView):
+class ProleagueView(
+    StatisticsReadMixin, ProleagueStatisticMixin, TemplateView
+):
     template_name = 'stats/leagues/proleague.html'
 
 
-class StarleagueView(StarleagueStatisticMixin, TemplateView):
+class StarleagueView(
+    StatisticsReadMixin, StarleagueStatisticMixin, TemplateView
+):
     template_name = 'stats/leagues/starleague.html'
 
 
-class MapView(MapStatisticMixin, TemplateView):
+class MapView(StatisticsReadMixin, MapStatisticMixin, TemplateView):
     template_name = 'stats/maps/list.html'
 
 
-class MapDetailView(MapSelectMixin, DetailView):
+class MapDetailView(StatisticsReadMixin, MapSelectMixin, DetailView):
     model = Map
     template_name = 'stats/maps/detail.html'
 
@@ -110,7 +139,7 @@ class MapUpdateView(MapSelectMixin, UpdateView):
     form_class = UpdateMapForm
 
 
-class CompareUserView(View):
+class CompareUserView(StatisticsReadMixin, View):
     template_name = 'stats/compare/compare.html'
     form_class = CompareUserForm
 
@@ -134,3 +163,201 @@ class CompareUserView(View):
                 'data': player.versus(opponent),
             }
         return render(request, self.template_name, context)
+
+
+class RivalryMatrixView(StatisticsReadMixin, TemplateView):
+    template_name = 'stats/compare/rivalry.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['matrix'] = HeadToHead.get_matrix()
+        return context
+
+
+class MatchListView(StatisticsReadMixin, View):
+    """
+    Render next page of matches in league or player page.
+    """
+    template_name = 'stats/results/match_page.html'
+
+    def get(self, request):
+        cursor = decode_match_cursor(request.GET.get('cursor', ''))
+        league_name = request.GET.get('league')
+        player_name = request.GET.get('player')
+
+        context = {}
+        if league_name:
+            league = get_object_or_404(League, name=league_name)
+            context.update(league.get_match_page(cursor))
+        elif player_name:
+            player = get_player(
+                Player.objects.all(), remove_space(player_name)
+            )
+            if player is None:
+                raise Http404
+            context['player'] = player
+            context.update(player.get_result_group(cursor))
+        else:
+            raise Http404
+        return render(request, self.template_name, context)
+
+
+class PlayerAutocompleteView(View):
+    """
+    Return names and urls of players matched with query as JSON.
+    """
+
+    def get(self, request):
+        name_list = player_name_index.search(request.GET.get('q', ''))
+        return JsonResponse({
+            'players': [
+                {
+                    'name': name,
+                    'url': reverse('stats:player', kwargs={'name': name}),
+                }
+                for name in name_list
+            ]
+        })
+
+
+class ResultExportView(StatisticsReadMixin, View):
+    """
+    Stream games as CSV or JSON lines, one row for each game.
+    Games can be filtered by league, player and dates in query string.
+    """
+    format_dict = {
+        'csv': (stream_csv, 'text/csv; charset=utf-8'),
+        'jsonl': (stream_jsonl, 'application/x-ndjson; charset=utf-8'),
+    }
+
+    def get(self, request, format):
+        if format not in self.format_dict:
+            raise Http404
+        stream, content_type = self.format_dict[format]
+
+        form = ResultExportForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        # Rows are streamed after view returns,
+        # so database is chosen while reading statistics.
+        games = Game.objects.using(router.db_for_read(Game))
+        response = StreamingHttpResponse(
+            stream(get_export_rows(form.filter(games))),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="results.{format}"'
+        )
+        return response
+
+
+class BaseStatisticsAPIView(StatisticsReadMixin, View, metaclass=ABCMeta):
+    """
+    Return statistics as JSON, with strong ETag of results in scope.
+    If ETag of request is not changed, return 304
+    without calculating statistics.
+    After you inherit this class,
+    you must set queryset of scope and data to return.
+    """
+
+    @abstractmethod
+    def get_etag_queryset(self):
+        pass
+
+    @abstractmethod
+    def get_data(self):
+        pass
+
+    @method_decorator(cache_control(no_cache=True))
+    def get(self, request, **kwargs):
+        # Path has names of scope, such as player and opponent.
+        @condition(etag_func=lambda request: get_etag(
+            request.path,
+            self.get_etag_queryset(),
+            League.get_statistics_version(),
+        ))
+        def get_response(request):
+            return JsonResponse(self.get_data())
+        return get_response(request)
+
+
+class ProleagueStatisticsAPIView(BaseStatisticsAPIView):
+    def get_etag_queryset(self):
+        return Result.objects.filter(league__type='proleague')
+
+    def get_data(self):
+        return serialize_league_statistics(
+            League.get_proleague_statistics()
+        )
+
+
+class StarleagueStatisticsAPIView(BaseStatisticsAPIView):
+    def get_etag_queryset(self):
+        return Result.objects.filter(league__type='starleague')
+
+    def get_data(self):
+        return serialize_league_statistics(
+            League.get_starleague_statistics()
+        )
+
+
+class MapStatisticsAPIView(BaseStatisticsAPIView):
+    def get_etag_queryset(self):
+        return Result.objects.filter(type='melee')
+
+    def get_data(self):
+        return serialize_map_statistics(Map.get_total_map_statistics())
+
+
+class PlayerStatisticsAPIView(PlayerSelectMixin, BaseStatisticsAPIView):
+    def get_queryset(self):
+        return Player.get_profile_queryset()
+
+    def get(self, request, **kwargs):
+        self.object = self.get_object()
+        return super().get(request, **kwargs)
+
+    def get_etag_queryset(self):
+        return Result.objects.filter(player=self.object)
+
+    def get_data(self):
+        return {
+            'name': self.object.name,
+            'most_race': self.object.most_race,
+            'tier': self.object.tier,
+            'statistics': serialize_player_statistics(
+                self.object.get_statistics()
+            ),
+        }
+
+
+class VersusStatisticsAPIView(PlayerSelectMixin, BaseStatisticsAPIView):
+    def get_queryset(self):
+        return Player.objects.all()
+
+    def get(self, request, **kwargs):
+        self.object = self.get_object()
+        self.opponent = get_player(
+            Player.objects.all(), remove_space(self.kwargs['opponent'])
+        )
+        if self.opponent is None:
+            raise Http404
+        return super().get(request, **kwargs)
+
+    def get_etag_queryset(self):
+        # Head to heads are counted from melee games of both players.
+        return Game.objects.filter(
+            (Q(winner=self.object) & Q(loser=self.opponent)) |
+            (Q(winner=self.opponent) & Q(loser=self.object)),
+            type='melee'
+        )
+
+    def get_data(self):
+        return {
+            'player': self.object.name,
+            'opponent': self.opponent.name,
+            'statistics': HeadToHead.get_statistics(
+                self.object, self.opponent
+            ),
+        }
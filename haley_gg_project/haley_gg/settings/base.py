@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import os
 import json
 
 from unipath import Path
@@ -83,6 +84,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'haley_gg.apps.stats.middleware.PrimaryStickinessMiddleware',
 ]
 
 ROOT_URLCONF = 'haley_gg.urls'
@@ -121,6 +123,66 @@ DATABASES = {
     }
 }
 
+# Replica of default database, to read statistics.
+# Set POSTGRES_REPLICA in secrets with same keys as POSTGRES to use it.
+# In tests, replica mirrors default database.
+if 'POSTGRES_REPLICA' in secrets:
+    REPLICA_DB_KEY = get_secret("POSTGRES_REPLICA")
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': REPLICA_DB_KEY['NAME'],
+        'USER': REPLICA_DB_KEY['USER'],
+        'PASSWORD': REPLICA_DB_KEY['PASSWORD'],
+        'HOST': REPLICA_DB_KEY['HOST'],
+        'PORT': REPLICA_DB_KEY['PORT'],
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+
+DATABASE_ROUTERS = [
+    'haley_gg.apps.stats.routers.StatisticsRouter',
+]
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+# Cache is shared by all processes in database,
+# so versions of statistics changed in one process are read in others.
+# Create table of cache with "python manage.py createcachetable".
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'haley_gg_cache',
+        'OPTIONS': {
+            # Versions of statistics are culled with other entries.
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+
+# Statistics
+
+# Sections of league statistics are calculated in this number of threads,
+# and each thread keeps its own database connection until exit.
+# On single core, threads only add cost of connections,
+# so sections are calculated in order.
+STATISTICS_THREAD_COUNT = min(4, os.cpu_count() or 1)
+
+# Alias of database what statistics are read from.
+# If it isn't in DATABASES, statistics are read from default database.
+STATISTICS_DATABASE = 'replica'
+
+# Seconds until cached statistics expire.
+# Statistics of previous versions are removed after it.
+STATISTICS_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Seconds to read from default database after writes,
+# longer than delay of replication.
+STATISTICS_STICKY_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
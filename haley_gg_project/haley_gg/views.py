@@ -7,7 +7,7 @@ from haley_gg.apps.stats.forms import SearchPlayerForm
 def main_page(request):
     form = SearchPlayerForm(request.GET or None)
     if form.is_valid():
-        # If there is no matched player... What to do?
+        # Form returns saved name of matched player.
         return HttpResponseRedirect(
             reverse(
                 'stats:player',
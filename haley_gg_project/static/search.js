@@ -0,0 +1,33 @@
+// Suggest player names to search form in main page.
+// Input has data-autocomplete-url and list attributes.
+document.addEventListener('DOMContentLoaded', function() {
+    let input = document.querySelector('input[data-autocomplete-url]');
+    if (!input)
+        return;
+    let datalist = document.getElementById(input.getAttribute('list'));
+    let timer = null;
+    let lastQuery = '';
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        // Wait until typing stops, not to request every key.
+        timer = setTimeout(function() {
+            let query = input.value.trim();
+            if (!query || query === lastQuery)
+                return;
+            lastQuery = query;
+            let url = input.dataset.autocompleteUrl
+                + '?q=' + encodeURIComponent(query);
+            fetch(url)
+                .then(function(response) { return response.json(); })
+                .then(function(data) {
+                    datalist.innerHTML = '';
+                    data.players.forEach(function(player) {
+                        let option = document.createElement('option');
+                        option.value = player.name;
+                        datalist.appendChild(option);
+                    });
+                });
+        }, 150);
+    });
+});